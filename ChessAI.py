@@ -1,43 +1,660 @@
 #AI file: in charge of implenting algorithms for AI gameplay
+import concurrent.futures
+import multiprocessing
+import os
 import random
+import time
+import warnings
+import ChessEngine, ChessBook, ChessCache, ChessTablebase
+ChessEval = None #imported by importEval when first needed, NumPy alone takes longer to import than the rest of the AI
 
 pieceWeight = {'K': 0, "Q": 10, "R": 5, "B": 3, "N": 3, "P": 1}
-CHECKMATE = 1000
+CHECKMATE = 100000 #scores are in centipawns
 STALEMATE = 0
+DRAW = 0 #repetition, fifty-move rule or insufficient material inside the search
 DEPTH = 3
+MAX_DEPTH = 64 #deepest iteration when searching on a time or node budget
+MAX_PLY = 128 #deepest ply including the quiescence search
+MATE_BOUND = CHECKMATE - MAX_PLY #a side mated at ply n scores -(CHECKMATE - n), anything past this bound is a mate
+DELTA_MARGIN = 200 #a capture that cannot lift the score this close to alpha is not searched
+TIME_LIMIT = 2.0 #seconds per move for the AI in the game window
+HASH_SIZE_MB = 16 #memory cap for the transposition table
+EXACT, LOWERBOUND, UPPERBOUND = 0, 1, 2 #how a stored score relates to the true score
+THREADS = 1 #search processes, with more than one the root moves are split across a process pool
+MOVE_ORDERING = True #turn off to measure how many more nodes the main search needs without it
+SELECTIVE_SEARCH = True #principal variation search, null-move pruning, late move reductions and check extensions
+NULL_MOVE_REDUCTION = 2 #extra depth taken off the reply to a null move
+NULL_MOVE_MIN_DEPTH = 3
+LMR_MIN_DEPTH = 3 #shallower nodes search every move at full depth
+LMR_FULL_MOVES = 3 #moves searched at full depth before later quiet moves are reduced
+LMR_DEEP_MOVES = 8 #quiet moves this late in the ordering are reduced by two plies
+USE_BOOK = True #play opening book moves when the book file exists
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "books", "openings.bin")
+USE_TABLEBASES = True #probe endgame tablebases when the tablebase directory holds tables
+TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+TB_WIN = CHECKMATE - 1000 #tablebase wins score below real mates and shorter wins score higher
+BATCH_EVAL = False #score positions in the quiescence search with ChessEval instead of GameState's incremental scores
+EVAL_WEIGHTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.npz") #learned weights for ChessEval, built-in ones when missing
+TUNED_WEIGHTS = False #score with the piece-square part of EVAL_WEIGHTS too, applied by applyTunedWeights
+USE_ANALYSIS_CACHE = False #answer positions searched before, in this or an earlier run, from the analysis cache file
+ANALYSIS_CACHE_FILE = ChessCache.DEFAULT_FILE #one file per engine configuration, results of other settings would be reused
+CAPTURE_ORDER, PROMOTION_ORDER, KILLER_ORDER = 3000000, 2000000, 1000000 #captures, then promotions, then killers, then history
+
+#fixed size table of searched positions indexed by zobrist key, kept for the whole game
+class TranspositionTable():
+    ENTRY_BYTES = 160 #approximate memory of one slot holding an entry tuple
+
+    def __init__(self, sizeMB = HASH_SIZE_MB):
+        self.resize(sizeMB)
+
+    def resize(self, sizeMB):
+        self.size = max(1, int(sizeMB * 1024 * 1024) // self.ENTRY_BYTES)
+        self.clear()
+
+    def clear(self):
+        self.entries = [None] * self.size #(key, depth, flag, score, bestMove, age)
+        self.used = 0
+        self.age = 0
+
+    #entries from earlier searches are still used but become the first to be replaced
+    def newSearch(self):
+        self.age += 1
+
+    def probe(self, key):
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    #depth-preferred replacement: a deeper entry from the current search is never overwritten by another position
+    def store(self, key, depth, flag, score, bestMove):
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is None:
+            self.used += 1
+        elif entry[0] != key and entry[5] == self.age and entry[1] > depth:
+            return
+        self.entries[index] = (key, depth, flag, score, bestMove, self.age)
+
+    #fill rate in permill
+    def hashfull(self):
+        return self.used * 1000 // self.size
+
+transpositionTable = TranspositionTable()
+searchInfo = {} #depth, score, nodes, time, nps and pv of the last completed iteration, iterations, book, tablebase or cached for a move found there
+openingBook = None #opened on first use
+tablebases = None #opened on first use, None when disabled or there are no tables
+evaluator = None #ChessEval.Evaluator while BATCH_EVAL is on
+analysisCache = None #opened on first use, again after a fork or a change of ANALYSIS_CACHE_FILE
+
+#batch evaluation needs NumPy, the search runs without it
+def importEval():
+    global ChessEval
+    if ChessEval is None:
+        try:
+            import ChessEval
+        except ImportError:
+            return None
+    return ChessEval
+
+builtinSquareScores = {piece: (ChessEngine.MG_SQUARE_SCORES[piece][:], ChessEngine.EG_SQUARE_SCORES[piece][:]) for piece in ChessEngine.MG_SQUARE_SCORES}
+tunedWeights = {} #(squareScores, hasMobility) of each weights file read
+appliedWeights = None #weights file in the engine's piece-square tables, None for the built-in ones
+
+#syncs the engine's piece-square tables with TUNED_WEIGHTS: the tuned ones of EVAL_WEIGHTS while it is on, the built-in
+#ones otherwise. importing the AI leaves them alone, every tool calls this before setting up a position, which is scored
+#with the tables. weights tuned with mobility are refused unless BATCH_EVAL is on, the tables would leave mobility out
+#returns True when the tables changed, positions set up before need gs.loadBitboards()
+def applyTunedWeights():
+    global appliedWeights
+    path = EVAL_WEIGHTS if TUNED_WEIGHTS and os.path.exists(EVAL_WEIGHTS) and importEval() is not None else None
+    if path is not None:
+        if path not in tunedWeights:
+            tuned = ChessEval.Evaluator(path)
+            tunedWeights[path] = tuned.squareScores(), tuned.hasMobility()
+        if tunedWeights[path][1] and not BATCH_EVAL:
+            warnings.warn("not applying " + path + ": its mobility weights need BATCH_EVAL, tune with --no-mobility")
+            path = None
+    if path == appliedWeights:
+        return False
+    for piece, (mg, eg) in (builtinSquareScores if path is None else tunedWeights[path][0]).items():
+        ChessEngine.MG_SQUARE_SCORES[piece][:] = mg
+        ChessEngine.EG_SQUARE_SCORES[piece][:] = eg
+    appliedWeights = path
+    return True
+
+pvTable = [[] for ply in range(MAX_PLY + 1)] #best line found from each ply of the current path
+principalVariation = [] #best line of the last completed iteration
+nodes = 0
+searchStopped = False
+stopTime = None
+maxNodes = None
+stopEvent = None #threading.Event another thread sets to cancel the search
+searchDepth = 0 #depth of the iteration being searched, for progress displays
+killerMoves = [[None, None] for ply in range(MAX_PLY + 1)] #two quiet moves per ply that recently caused a cutoff
+historyTable = {color + piece: [0] * 64 for color in 'wb' for piece in 'PRNBQK'} #cutoff score of quiet moves by piece and end square
+
+#a weighted random move from the opening book, None when there is no book or the position is out of book
+def findBookMove(gs, validMoves):
+    global openingBook
+    if openingBook is None:
+        if not os.path.exists(BOOK_FILE):
+            return None
+        openingBook = ChessBook.OpeningBook(BOOK_FILE)
+    return openingBook.getMove(gs, validMoves)
+
+#opens the tablebases once, later calls return the same object
+def loadTablebases():
+    global tablebases
+    if not USE_TABLEBASES:
+        tablebases = None #also keeps the search from probing
+        return None
+    if tablebases is None and os.path.isdir(TABLEBASE_DIR):
+        tablebases = ChessTablebase.Tablebases(TABLEBASE_DIR)
+        if not tablebases.available:
+            tablebases = None
+    return tablebases
+
+#the root move with the fastest win, else a drawing move, else the longest loss, None when the tables do not cover it
+def findTablebaseMove(gs, validMoves):
+    if loadTablebases() is None or tablebases.probe(gs) is None:
+        return None
+    bestMove = None
+    bestScore = -CHECKMATE
+    for move in validMoves:
+        gs.makeMove(move)
+        value = tablebases.probe(gs)
+        gs.undoMove()
+        if value is None:
+            return None
+        score = -tablebaseScore(value)
+        if score > bestScore:
+            bestScore = score
+            bestMove = move
+    return bestMove
+
+#search score of a table byte for the side to move
+def tablebaseScore(value):
+    result, plies = ChessTablebase.decodeValue(value)
+    if result == "win":
+        return TB_WIN - plies
+    if result == "loss":
+        return -TB_WIN + plies
+    return DRAW
+
+#opens the analysis cache for this process, None when it is off
+def loadAnalysisCache():
+    global analysisCache
+    if not USE_ANALYSIS_CACHE:
+        analysisCache = None
+    elif analysisCache is None or analysisCache.path != ANALYSIS_CACHE_FILE or analysisCache.pid != os.getpid():
+        analysisCache = ChessCache.AnalysisCache(ANALYSIS_CACHE_FILE)
+    return analysisCache
+
+#(move, depth, score) stored for the position when an earlier search of it went at least as far as this one
+#would by depth, time or nodes, None otherwise. a stored move is not trusted when it is not legal (a key collision)
+#or would now repeat the position a third time while the stored score is not a draw
+def findCachedMove(gs, validMoves, timeLimit, nodeLimit, depthLimit):
+    if loadAnalysisCache() is None or gs.halfmoveClock >= 90:
+        return None
+    entry = analysisCache.probe(gs.zobristKey)
+    if entry is None:
+        return None
+    depth, score, notation, nodeCount, seconds = entry
+    if depth < depthLimit and (timeLimit is None or seconds < timeLimit) and (nodeLimit is None or nodeCount < nodeLimit):
+        return None
+    move = next((move for move in validMoves if move.getUCINotation() == notation), None)
+    if move is None:
+        return None
+    gs.makeMove(move)
+    repeats = gs.repetitionCount() >= 2
+    gs.undoMove()
+    if repeats and score != DRAW:
+        return None
+    return move, depth, score
+
+#writes the result of a finished search, with the budget it had unless it was cancelled before using it
+def storeAnalysis(gs, move, timeLimit, nodeLimit, cancelled):
+    if loadAnalysisCache() is None:
+        return
+    seconds = searchInfo['time'] if cancelled or timeLimit is None else max(searchInfo['time'], timeLimit)
+    nodeCount = searchInfo['nodes'] if cancelled or nodeLimit is None else max(searchInfo['nodes'], nodeLimit)
+    analysisCache.store(gs.zobristKey, searchInfo['depth'], searchInfo['score'], move.getUCINotation(), nodeCount, seconds)
+
+#sets up the evaluator with the weights file when BATCH_EVAL is on and NumPy is installed
+def loadEvaluator():
+    global evaluator
+    if not BATCH_EVAL or importEval() is None:
+        evaluator = None
+    elif evaluator is None:
+        evaluator = ChessEval.Evaluator(EVAL_WEIGHTS if os.path.exists(EVAL_WEIGHTS) else None)
+    return evaluator
 
 # random move set for initial testing and if no best moves are found
 def findRandomMove(validMoves):
     return validMoves[random.randint(0, len(validMoves) - 1)]
 
-def findBestMove(gs, validMoves): #Mover function for implementing algorithm
-    global nextMove
-    nextMove = None
+#iterative deepening: searches depth 1, 2, 3... and keeps the move of the last completed depth
+#without a time or node budget it stops at DEPTH or depthLimit, a set cancelEvent stops it at once and may leave no move
+#onIteration is called with searchInfo after every completed depth
+def findBestMove(gs, validMoves, timeLimit = None, nodeLimit = None, cancelEvent = None, depthLimit = None, onIteration = None): #Mover function for implementing algorithm
+    global nextMove, nodes, searchStopped, stopTime, maxNodes, stopEvent, searchDepth, principalVariation
+    if USE_BOOK:
+        bookMove = findBookMove(gs, validMoves)
+        if bookMove is not None: #book moves are played at once
+            nodes = 0
+            searchInfo.clear()
+            searchInfo.update(depth = 0, score = 0, nodes = 0, time = 0.0, nps = 0, pv = [bookMove], book = True)
+            return bookMove
+    loadEvaluator()
+    tablebaseMove = findTablebaseMove(gs, validMoves)
+    if tablebaseMove is not None: #the tables already know the best result
+        nodes = 0
+        searchInfo.clear()
+        gs.makeMove(tablebaseMove)
+        score = -tablebaseScore(tablebases.probe(gs))
+        gs.undoMove()
+        searchInfo.update(depth = 0, score = score, nodes = 0, time = 0.0, nps = 0, pv = [tablebaseMove], tablebase = True)
+        return tablebaseMove
+    if depthLimit is None:
+        depthLimit = MAX_DEPTH if timeLimit is not None or nodeLimit is not None else DEPTH
+    cached = findCachedMove(gs, validMoves, timeLimit, nodeLimit, depthLimit)
+    if cached is not None: #searched as far before
+        cachedMove, depth, score = cached
+        nodes = 0
+        searchInfo.clear()
+        searchInfo.update(depth = depth, score = score, nodes = 0, time = 0.0, nps = 0, pv = [cachedMove], cached = True)
+        return cachedMove
+    if THREADS > 1:
+        bestMove = findBestMoveParallel(gs, validMoves, depthLimit, THREADS, timeLimit, nodeLimit, cancelEvent, onIteration)
+        if bestMove is not None:
+            storeAnalysis(gs, bestMove, timeLimit, nodeLimit, cancelEvent is not None and cancelEvent.is_set())
+        return bestMove
     random.shuffle(validMoves)
-    findMinMaxWithAlphaBeta(gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE, 1 if gs.whiteMove else -1)
-    return nextMove
+    transpositionTable.newSearch()
+    searchInfo.clear()
+    nodes = 0
+    searchStopped = False
+    startTime = time.time()
+    stopTime = startTime + timeLimit if timeLimit is not None else None
+    maxNodes = nodeLimit
+    stopEvent = cancelEvent
+    principalVariation = []
+    for killers in killerMoves:
+        killers[0] = killers[1] = None
+    for piece in historyTable: #older history still helps but counts for less
+        historyTable[piece] = [score // 2 for score in historyTable[piece]]
+    bestMove = None
+    iterations = [] #(depth, nodes, seconds) at the end of each completed iteration
+    for depth in range(1, depthLimit + 1):
+        nextMove = None
+        searchDepth = depth
+        score = findMinMaxWithAlphaBeta(gs, validMoves, depth, -CHECKMATE, CHECKMATE, 1 if gs.whiteMove else -1)
+        if searchStopped: #unfinished iteration, its result is discarded
+            break
+        if nextMove is not None: #the root did not raise alpha, keep the move of the previous depth
+            bestMove = nextMove
+        principalVariation = pvTable[0][:]
+        elapsed = time.time() - startTime
+        searchInfo.update(depth = depth, score = score, nodes = nodes, time = elapsed, nps = int(nodes / max(elapsed, 1e-6)), pv = principalVariation)
+        iterations.append((depth, nodes, elapsed))
+        searchInfo['iterations'] = iterations
+        if onIteration is not None:
+            onIteration(searchInfo)
+        if CHECKMATE - abs(score) <= depth or len(validMoves) <= 1: #a longer mate may still be beaten by searching deeper
+            break
+        if stopTime is not None and time.time() + elapsed > stopTime: #the next depth is unlikely to finish in time
+            break
+    if bestMove is not None:
+        storeAnalysis(gs, bestMove, timeLimit, nodeLimit, cancelEvent is not None and cancelEvent.is_set())
+    return bestMove
+
+#stops the search once the time or node budget is used up, checked every 256 nodes
+#the first iteration always finishes so there is a move to play, unless the search is cancelled
+def checkLimits():
+    global searchStopped
+    if stopEvent is not None and stopEvent.is_set():
+        searchStopped = True
+    elif searchInfo and ((stopTime is not None and time.time() >= stopTime) or (maxNodes is not None and nodes >= maxNodes)):
+        searchStopped = True
+
+#captures by most valuable victim / least valuable attacker, then promotions, killers and history
+#the sort is stable so equal moves keep their shuffled order
+def orderMoves(validMoves, ply):
+    killers = killerMoves[ply]
+    def moveOrder(move):
+        if move.pieceCaptured != '--':
+            return CAPTURE_ORDER + 10 * pieceWeight[move.pieceCaptured[1]] - pieceWeight[move.pieceMoved[1]] + (pieceWeight[move.promotionChoice] if move.isPawnPromotion else 0)
+        if move.isPawnPromotion:
+            return PROMOTION_ORDER + pieceWeight[move.promotionChoice]
+        if move == killers[0]:
+            return KILLER_ORDER + 1
+        if move == killers[1]:
+            return KILLER_ORDER
+        return historyTable[move.pieceMoved][move.endRow * 8 + move.endCol]
+    return sorted(validMoves, key = moveOrder, reverse = True)
+
+#a quiet move that caused a cutoff becomes a killer for its ply and gains history
+def storeCutoff(move, depth, ply):
+    if not MOVE_ORDERING or move.pieceCaptured != '--' or move.isPawnPromotion:
+        return
+    killers = killerMoves[ply]
+    if move != killers[0]:
+        killers[1] = killers[0]
+        killers[0] = move
+    historyTable[move.pieceMoved][move.endRow * 8 + move.endCol] += depth * depth
+
+#returns the moves with one of them moved to the front
+def searchFirst(validMoves, firstMove):
+    for i in range(len(validMoves)):
+        if validMoves[i] == firstMove:
+            return [validMoves[i]] + validMoves[:i] + validMoves[i + 1:]
+    return validMoves
+
+def findMinMaxWithAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier, ply = 0): #implemented alpha/beta pruning. improved run time
+    global nextMove, nodes
+    pvTable[ply] = []
+    if ply > 0 and (gs.halfmoveClock >= 100 or gs.isRepetition(ply) or gs.isInsufficientMaterial()):
+        return DRAW #cycles are cut off at once
+    if ply > 0 and tablebases is not None and bin(gs.occupancy['w'] | gs.occupancy['b']).count('1') <= tablebases.maxPieces:
+        value = tablebases.probe(gs)
+        if value is not None:
+            return tablebaseScore(value)
+    inCheck = SELECTIVE_SEARCH and gs.inCheck()
+    if inCheck and ply < 2 * searchDepth: #check extension, bounded so a long series of checks still ends
+        depth += 1
+    if depth == 0 or ply >= MAX_PLY: #the quiescence search returns the static score this deep
+        return quiescenceSearch(gs, alpha, beta, turnMultiplier, ply)
+    nodes += 1
+    if nodes & 255 == 0:
+        checkLimits()
+    if validMoves is None: #a leaf extended by a check
+        validMoves = gs.getValidMoves()
+    if len(validMoves) == 0: #checkmate or stalemate, a nearer mate scores higher
+        return -CHECKMATE + ply if gs.checkmate else STALEMATE
+
+    alphaOrig = alpha
+    entry = transpositionTable.probe(gs.zobristKey)
+    if entry is not None:
+        key, entryDepth, flag, entryScore, entryMove, age = entry
+        if entryDepth >= depth and ply > 0: #the root always searches so it can set nextMove
+            entryScore = scoreFromTable(entryScore, ply)
+            if flag == EXACT or (flag == LOWERBOUND and entryScore >= beta) or (flag == UPPERBOUND and entryScore <= alpha):
+                return entryScore
+    #null move: if passing the turn still fails high on a reduced search, a real move will too
+    #not in check, not twice in a row and not with only pawns left, where passing could be the better move
+    if SELECTIVE_SEARCH and ply > 0 and depth >= NULL_MOVE_MIN_DEPTH and not inCheck and abs(beta) < TB_WIN and \
+       gs.moveLog[-1] is not None and hasPieces(gs) and turnMultiplier * scoreBoard(gs) >= beta:
+        nullDepth = depth - 1 - NULL_MOVE_REDUCTION
+        gs.makeNullMove()
+        score = -findMinMaxWithAlphaBeta(gs, gs.getValidMoves() if nullDepth > 0 else None, nullDepth, -beta, -beta + 1, -turnMultiplier, ply + 1)
+        gs.undoNullMove()
+        if searchStopped:
+            return 0
+        if score >= beta:
+            return beta
+    if MOVE_ORDERING:
+        validMoves = orderMoves(validMoves, ply)
+    if entry is not None:
+        validMoves = searchFirst(validMoves, entry[4])
+    #while following the previous iteration's principal variation, its move goes first
+    if ply < len(principalVariation) and gs.moveLog[len(gs.moveLog) - ply:] == principalVariation[:ply]:
+        validMoves = searchFirst(validMoves, principalVariation[ply])
 
-def findMinMaxWithAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier): #implemented alpha/beta pruning. improved run time
-    global nextMove
-    if depth == 0:
-        return turnMultiplier * scoreBoard(gs)
-    
     maxScore = -CHECKMATE
-    for move in validMoves:
+    bestMove = None
+    killers = killerMoves[ply]
+    for i, move in enumerate(validMoves):
+        if ply == 1 and polledAlpha is not None: #root-parallel worker: other workers may have raised the root alpha since the last move
+            beta = min(beta, -pollSharedAlpha())
+            if alpha >= beta:
+                break
         gs.makeMove(move)
-        nextMoves = gs.getValidMoves()
-        score = -findMinMaxWithAlphaBeta(gs, nextMoves, depth - 1,  -beta, -alpha, -turnMultiplier)
+        nextMoves = gs.getValidMoves() if depth > 1 else None #leaves generate their own captures
+        if not SELECTIVE_SEARCH or i == 0:
+            score = -findMinMaxWithAlphaBeta(gs, nextMoves, depth - 1,  -beta, -alpha, -turnMultiplier, ply + 1)
+        else:
+            #principal variation search: later moves only have to prove they are no better than alpha with a zero window
+            #late quiet moves that do not give check are searched shallower and re-searched if they beat alpha
+            reduction = 0
+            if depth >= LMR_MIN_DEPTH and i >= LMR_FULL_MOVES and not inCheck and gs.checks == 0 and move.pieceCaptured == '--' and \
+               not move.isPawnPromotion and move != killers[0] and move != killers[1]:
+                reduction = 1 if i < LMR_DEEP_MOVES else 2
+            score = -findMinMaxWithAlphaBeta(gs, nextMoves, depth - 1 - reduction, -alpha - 1, -alpha, -turnMultiplier, ply + 1)
+            if score > alpha and reduction:
+                score = -findMinMaxWithAlphaBeta(gs, nextMoves, depth - 1, -alpha - 1, -alpha, -turnMultiplier, ply + 1)
+            if alpha < score < beta:
+                score = -findMinMaxWithAlphaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -turnMultiplier, ply + 1)
+        gs.undoMove()
+        if searchStopped:
+            return 0
         if score > maxScore:
             maxScore = score
-            if depth == DEPTH:
+            bestMove = move
+            pvTable[ply] = [move] + pvTable[ply + 1]
+            if ply == 0:
                 nextMove = move
-        gs.undoMove()
         if maxScore > alpha: #alpha/beta pruning steps
             alpha = maxScore
         if alpha >= beta:
+            storeCutoff(move, depth, ply)
             break
+
+    if maxScore <= alphaOrig:
+        flag = UPPERBOUND
+    elif maxScore >= beta:
+        flag = LOWERBOUND
+    else:
+        flag = EXACT
+    transpositionTable.store(gs.zobristKey, depth, flag, scoreToTable(maxScore, ply), bestMove)
     return maxScore
 
+#the table keeps mate scores as the distance from the stored position, the search as the distance from the root
+def scoreToTable(score, ply):
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+def scoreFromTable(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+#the side to move has a knight, bishop, rook or queen, so it is unlikely to be in zugzwang
+def hasPieces(gs):
+    color = 'w' if gs.whiteMove else 'b'
+    bb = gs.bitboards
+    return (bb[color + 'N'] | bb[color + 'B'] | bb[color + 'R'] | bb[color + 'Q']) != 0
+
+#searches captures only until the position is quiet, so trades are not cut off halfway at depth 0
+def quiescenceSearch(gs, alpha, beta, turnMultiplier, ply):
+    global nodes
+    nodes += 1
+    if nodes & 255 == 0:
+        checkLimits()
+    inCheck = gs.inCheck()
+    if inCheck and ply >= MAX_PLY: #too deep to search the evasions, the static score has to do
+        return turnMultiplier * (scoreBoard(gs) if evaluator is None else evaluator.scorePosition(gs))
+    if inCheck: #no standing pat while in check, every evasion is searched
+        moves = gs.getValidMoves()
+        if len(moves) == 0:
+            return -CHECKMATE + ply
+        standPat = maxScore = -CHECKMATE
+    else:
+        standPat = maxScore = turnMultiplier * (scoreBoard(gs) if evaluator is None else evaluator.scorePosition(gs)) #the side to move can decline every capture
+        if maxScore >= beta or ply >= MAX_PLY:
+            return maxScore
+        if maxScore > alpha:
+            alpha = maxScore
+        moves = gs.getCaptureMoves()
+    for move in orderMoves(moves, ply):
+        if not inCheck and move.isPawnPromotion and move.promotionChoice != 'Q': #underpromoting captures are left to the main search
+            continue
+        #delta pruning: even winning the captured piece for free would leave the score below alpha
+        if not inCheck and not move.isPawnPromotion and standPat + 100 * pieceWeight[move.pieceCaptured[1]] + DELTA_MARGIN <= alpha:
+            continue
+        gs.makeMove(move)
+        score = -quiescenceSearch(gs, -beta, -alpha, -turnMultiplier, ply + 1)
+        gs.undoMove()
+        if searchStopped:
+            return 0
+        if score > maxScore:
+            maxScore = score
+        if maxScore > alpha:
+            alpha = maxScore
+        if alpha >= beta:
+            break
+    return maxScore
+
+#root-parallel search: the root moves are split across worker processes, each keeping its own transposition table
+#young brothers wait: the first root move is searched alone so the rest start with a real alpha bound,
+#every worker that finds a better score raises the shared alpha, and the workers still searching read it again
+#before each reply to their root move, so a bound found elsewhere cuts their search short
+processPool = None
+poolWorkers = 0
+sharedAlpha = None #multiprocessing.Value with the best root score found so far at the current depth
+sharedStop = None #multiprocessing.Event the parent sets to stop every worker when the search runs out of budget
+polledAlpha = None #highest shared alpha this worker's search has read, None outside a root-parallel worker
+rootIteration = 0 #counts the root iterations sent to the pool, so a worker ages its table once per iteration
+workerIteration = None #root iteration this worker last searched
+
+def getProcessPool(workers):
+    global processPool, poolWorkers, sharedAlpha, sharedStop
+    if processPool is None or poolWorkers != workers:
+        shutdownProcessPool()
+        sharedAlpha = multiprocessing.Value('i', -CHECKMATE)
+        sharedStop = multiprocessing.Event()
+        processPool = concurrent.futures.ProcessPoolExecutor(max_workers = workers, initializer = initWorker, initargs = (sharedAlpha, sharedStop))
+        poolWorkers = workers
+    return processPool
+
+def shutdownProcessPool():
+    global processPool, poolWorkers
+    if processPool is not None:
+        processPool.shutdown()
+        processPool = None
+        poolWorkers = 0
+
+def initWorker(alphaValue, stopValue):
+    global sharedAlpha, sharedStop
+    sharedAlpha = alphaValue
+    sharedStop = stopValue
+
+#reads the shared root alpha, it only rises during an iteration
+def pollSharedAlpha():
+    global polledAlpha
+    polledAlpha = max(polledAlpha, sharedAlpha.value)
+    return polledAlpha
+
+#runs in a worker: plays one root move of the FEN position and searches the reply
+#history holds the keys of the positions since the last capture or pawn move, so repetitions are still found
+#returns (moveID, score, highest alpha the search read, nodes), a score at or below that alpha is only an upper bound
+def searchRootMove(fen, history, moveID, depth, iteration):
+    global nodes, searchStopped, stopTime, maxNodes, stopEvent, principalVariation, searchDepth, polledAlpha, workerIteration
+    gs = ChessEngine.GameState()
+    gs.loadFEN(fen)
+    gs.stateLog = [(gs.castlingRights, (), key, 0) for key in history] #only the keys of these entries are read
+    move = next(move for move in gs.getValidMoves() if move.moveID == moveID)
+    if iteration != workerIteration: #entries from the previous iteration may be replaced
+        transpositionTable.newSearch()
+        workerIteration = iteration
+    nodes = 0
+    searchStopped = False
+    stopTime = maxNodes = None
+    stopEvent = sharedStop
+    principalVariation = []
+    searchDepth = depth
+    loadTablebases()
+    loadEvaluator()
+    polledAlpha = -CHECKMATE
+    alpha = pollSharedAlpha()
+    turnMultiplier = 1 if gs.whiteMove else -1
+    gs.makeMove(move)
+    nextMoves = gs.getValidMoves() if depth > 1 else None
+    score = -findMinMaxWithAlphaBeta(gs, nextMoves, depth - 1, -CHECKMATE, -alpha, -turnMultiplier, 1)
+    alpha = polledAlpha
+    polledAlpha = None
+    if not searchStopped:
+        with sharedAlpha.get_lock():
+            if score > sharedAlpha.value:
+                sharedAlpha.value = score
+    return moveID, score, alpha, nodes
+
+#yields the results of the root move searches as they finish, checking the time, node and cancel limits meanwhile
+#once a limit is hit every worker is told to stop, the searches already started still return but their scores are unusable
+def collectRootMoves(futures):
+    global nodes
+    pending = set(futures)
+    while pending:
+        done, pending = concurrent.futures.wait(pending, timeout = 0.05, return_when = concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future.cancelled():
+                continue
+            moveID, score, alpha, moveNodes = future.result()
+            nodes += moveNodes
+            yield moveID, score, alpha
+        if not searchStopped:
+            checkLimits()
+            if searchStopped:
+                sharedStop.set()
+                for future in pending: #root moves no worker has started yet are dropped
+                    future.cancel()
+
+#iterative deepening with the root moves searched in parallel, workers defaults to the core count
+#the limits work as in findBestMove, except that nodes are only counted when a root move finishes
+#positions are sent to the workers as FEN strings and position keys rather than pickled GameStates
+def findBestMoveParallel(gs, validMoves, depth = DEPTH, workers = None, timeLimit = None, nodeLimit = None, cancelEvent = None, onIteration = None):
+    global nodes, searchStopped, stopTime, maxNodes, stopEvent, searchDepth, principalVariation, rootIteration
+    pool = getProcessPool(workers or os.cpu_count() or 1)
+    fen = gs.getFEN()
+    history = [state[2] for state in gs.stateLog[max(len(gs.stateLog) - gs.halfmoveClock, 0):]]
+    random.shuffle(validMoves)
+    searchInfo.clear()
+    nodes = 0
+    searchStopped = False
+    startTime = time.time()
+    stopTime = startTime + timeLimit if timeLimit is not None else None
+    maxNodes = nodeLimit
+    stopEvent = cancelEvent
+    principalVariation = []
+    sharedStop.clear()
+    rootMoves = {move.moveID: move for move in validMoves}
+    order = [move.moveID for move in orderMoves(validMoves, 0)]
+    bestMove = None
+    for d in range(1, depth + 1):
+        searchDepth = d
+        rootIteration += 1
+        sharedAlpha.value = -CHECKMATE
+        scores = {}
+        for bestID, bestScore, alpha in collectRootMoves([pool.submit(searchRootMove, fen, history, order[0], d, rootIteration)]):
+            scores[bestID] = bestScore
+        if not searchStopped:
+            futures = [pool.submit(searchRootMove, fen, history, moveID, d, rootIteration) for moveID in order[1:]]
+            for moveID, score, alpha in collectRootMoves(futures):
+                scores[moveID] = score
+                if score > alpha and score > bestScore:
+                    bestID, bestScore = moveID, score
+        if searchStopped: #unfinished iteration, its result is discarded
+            break
+        order.sort(key = lambda moveID: scores[moveID], reverse = True)
+        order.remove(bestID)
+        order.insert(0, bestID)
+        bestMove = rootMoves[bestID]
+        principalVariation = [bestMove]
+        elapsed = time.time() - startTime
+        searchInfo.update(depth = d, score = bestScore, nodes = nodes, time = elapsed, nps = int(nodes / max(elapsed, 1e-6)), pv = principalVariation)
+        if onIteration is not None:
+            onIteration(searchInfo)
+        if CHECKMATE - abs(bestScore) <= d or len(order) <= 1:
+            break
+        if stopTime is not None and time.time() + elapsed > stopTime: #the next depth is unlikely to finish in time
+            break
+    return bestMove
+
 # implementing algorithns such as minimax/greedy (NOT IN USE)
 def findBestMoveGreedy(gs, validMoves):
     turnMultiplier = 1 if gs.whiteMove else -1
@@ -109,15 +726,10 @@ def scoreBoard(gs):    #positve score is white advanatage and negative score is
             return CHECKMATE
     elif gs.stalemate:
         return STALEMATE
-    
-    score = 0
-    for row in gs.board:
-        for square in row:
-            if square[0] == 'w':
-                score += pieceWeight[square[1]]
-            elif square[0] == 'b':
-                score -= pieceWeight[square[1]]
-    return score
+
+    #GameState keeps material and piece-square scores up to date, blend them by how much material is left
+    phase = min(gs.phase, ChessEngine.TOTAL_PHASE)
+    return (gs.mgScore * phase + gs.egScore * (ChessEngine.TOTAL_PHASE - phase)) // ChessEngine.TOTAL_PHASE
 
 # Scoring for the board
 def scoreMaterial(board):
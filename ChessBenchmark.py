@@ -0,0 +1,110 @@
+#Benchmark file: in charge of timing the AI search
+#usage: python ChessBenchmark.py [--depth N] [--workers 1 2 4 8] or python ChessBenchmark.py --memory [--depth N]
+#       python ChessBenchmark.py --search [--depth 6]
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+import ChessEngine, ChessAI
+
+#middlegame positions with plenty of root moves to split
+BENCHMARK_FENS = [
+    ChessEngine.START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+]
+
+#time of the parallel search over every benchmark position, returns (seconds, nodes)
+def timeParallelSearch(depth, workers):
+    ChessAI.getProcessPool(workers) #start the workers before the clock
+    totalTime = totalNodes = 0
+    for fen in BENCHMARK_FENS:
+        gs = ChessEngine.GameState()
+        gs.loadFEN(fen)
+        startTime = time.time()
+        ChessAI.findBestMoveParallel(gs, gs.getValidMoves(), depth, workers)
+        totalTime += time.time() - startTime
+        totalNodes += ChessAI.nodes
+    return totalTime, totalNodes
+
+def benchmarkParallel(depth, workerCounts):
+    results = []
+    for workers in workerCounts:
+        elapsed, nodes = timeParallelSearch(depth, workers)
+        results.append((workers, elapsed, nodes))
+    ChessAI.shutdownProcessPool()
+    baseTime = results[0][1]
+    print("workers     time      nodes    speed-up")
+    for workers, elapsed, nodes in results:
+        print("%7d %7.2fs %10d %10.2fx" % (workers, elapsed, nodes, baseTime / elapsed))
+
+#serial search under tracemalloc: Move objects built and peak memory per searched node
+def benchmarkMemory(depth):
+    ChessAI.DEPTH = depth
+    totalNodes = 0
+    movesBefore = len(ChessEngine.MOVE_CACHE)
+    tracemalloc.start()
+    startTime = time.time()
+    for fen in BENCHMARK_FENS:
+        gs = ChessEngine.GameState()
+        gs.loadFEN(fen)
+        ChessAI.transpositionTable.clear()
+        ChessAI.findBestMove(gs, gs.getValidMoves())
+        totalNodes += ChessAI.nodes
+    elapsed = time.time() - startTime
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    movesBuilt = len(ChessEngine.MOVE_CACHE) - movesBefore
+    print("nodes", totalNodes, "time %.2fs (traced)" % elapsed)
+    print("Move objects built", movesBuilt, "per node %.3f" % (movesBuilt / totalNodes), "bytes per Move", sys.getsizeof(next(iter(ChessEngine.MOVE_CACHE.values()))))
+    print("peak traced memory", peak, "bytes per node %.1f" % (peak / totalNodes))
+
+#nodes and time to reach each depth with and without the selective search, and the effective branching factor
+#(nodes to finish a depth over nodes to finish the one before) of the last depth
+def benchmarkSearch(depth):
+    ChessAI.USE_BOOK = False
+    ChessAI.USE_ANALYSIS_CACHE = False
+    ChessAI.DEPTH = depth
+    results = {}
+    for selective in (False, True):
+        ChessAI.SELECTIVE_SEARCH = selective
+        totals = [[0, 0.0] for d in range(depth + 1)] #nodes and seconds to finish each depth, over every position
+        for fen in BENCHMARK_FENS:
+            gs = ChessEngine.GameState()
+            gs.loadFEN(fen)
+            random.seed(0)
+            ChessAI.transpositionTable.clear()
+            for piece in ChessAI.historyTable:
+                ChessAI.historyTable[piece] = [0] * 64
+            ChessAI.findBestMove(gs, gs.getValidMoves())
+            for d, nodes, elapsed in ChessAI.searchInfo['iterations']:
+                totals[d][0] += nodes
+                totals[d][1] += elapsed
+        results[selective] = totals
+    print("search       depth      nodes      time    EBF")
+    for selective in (False, True):
+        totals = results[selective]
+        for d in range(1, depth + 1):
+            ebf = totals[d][0] / totals[d - 1][0] if d > 1 and totals[d - 1][0] else 0
+            print("%-10s %7d %10d %8.2fs %6.2f" % ("selective" if selective else "full", d, totals[d][0], totals[d][1], ebf))
+    plain, selective = results[False][depth], results[True][depth]
+    print("depth %d: %.1fx fewer nodes, %.1fx faster" % (depth, plain[0] / max(selective[0], 1), plain[1] / max(selective[1], 1e-6)))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Timing and memory of the AI search at a fixed depth")
+    parser.add_argument("--depth", type = int, default = 4)
+    parser.add_argument("--workers", type = int, nargs = "+", default = [1, 2, 4, 8])
+    parser.add_argument("--memory", action = "store_true", help = "report Move objects built and memory per node")
+    parser.add_argument("--search", action = "store_true", help = "compare the selective search with the full-width search")
+    args = parser.parse_args()
+    if args.memory:
+        benchmarkMemory(args.depth)
+    elif args.search:
+        benchmarkSearch(args.depth)
+    else:
+        benchmarkParallel(args.depth, args.workers)
+
+if __name__ == "__main__":
+    main()
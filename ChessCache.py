@@ -0,0 +1,118 @@
+#Cache file: in charge of the analysis cache, search results kept on disk between runs
+#usage: python ChessCache.py stats [--file analysis.db]
+#       python ChessCache.py probe --fen FEN [--file analysis.db]
+#       python ChessCache.py clear [--file analysis.db]
+import argparse
+import os
+import sqlite3
+import time
+import ChessEngine
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analysis.db")
+MAX_ENTRIES = 200000 #least recently used positions are dropped past this, about 20 MB
+EVICT_EVERY = 256 #stores between size checks, counting the rows reads the whole table
+EVICT_TO = 0.9 #eviction leaves this much of MAX_ENTRIES so it does not run on every check
+BUSY_TIMEOUT = 30 #seconds a process waits for another process's write
+
+#SQLite integers are signed 64-bit, Zobrist keys are unsigned
+def signedKey(key):
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+#one row per position: the deepest search result stored for it and how much search it took
+#the file is in WAL mode, so any number of processes can read while one writes and waiting writers queue up.
+#a connection must not cross a fork, open the cache again in each worker process
+class AnalysisCache():
+    def __init__(self, path = DEFAULT_FILE, maxEntries = MAX_ENTRIES):
+        self.path = path
+        self.maxEntries = maxEntries
+        self.pid = os.getpid()
+        self.stores = 0
+        self.touched = {} #key -> time of the probe hits not yet written, written with the next store or eviction
+        self.connection = sqlite3.connect(path, timeout = BUSY_TIMEOUT, isolation_level = None) #every statement commits by itself
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL") #a crash may lose the last results but never corrupts the file
+        self.connection.execute("CREATE TABLE IF NOT EXISTS analysis (key INTEGER PRIMARY KEY, depth INTEGER, score INTEGER, move TEXT, nodes INTEGER, seconds REAL, used REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS analysisUsed ON analysis (used)")
+
+    def close(self):
+        try:
+            self.flushUsed()
+        except sqlite3.Error:
+            pass
+        self.connection.close()
+
+    #(depth, score for the side to move, UCI move, nodes, seconds) of a position key, None when it is not stored
+    #a busy or broken file counts as a miss, the search goes on without the cache. a hit is only a read,
+    #its time of use is kept in touched until the next write
+    def probe(self, key):
+        try:
+            row = self.connection.execute("SELECT depth, score, move, nodes, seconds FROM analysis WHERE key = ?", (signedKey(key),)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is not None:
+            self.touched[signedKey(key)] = time.time()
+        return row
+
+    #writes the times of use of the probe hits since the last write, inside the caller's transaction when there is one
+    def flushUsed(self):
+        if self.touched:
+            self.connection.executemany("UPDATE analysis SET used = ? WHERE key = ?", [(used, key) for key, used in self.touched.items()])
+            self.touched.clear()
+
+    #keeps the deeper result when the position is already stored, the pending times of use go in the same transaction
+    def store(self, key, depth, score, move, nodes, seconds):
+        try:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.flushUsed()
+            self.connection.execute("INSERT INTO analysis VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET depth = excluded.depth, "
+                                    "score = excluded.score, move = excluded.move, nodes = excluded.nodes, seconds = excluded.seconds, used = excluded.used "
+                                    "WHERE excluded.depth >= analysis.depth", (signedKey(key), depth, score, move, nodes, seconds, time.time()))
+            self.connection.execute("COMMIT")
+            if self.stores % EVICT_EVERY == 0:
+                self.evict()
+            self.stores += 1
+        except sqlite3.Error:
+            if self.connection.in_transaction:
+                self.connection.execute("ROLLBACK")
+
+    #drops the least recently used positions once there are more than maxEntries, after writing the pending times of use
+    def evict(self):
+        self.flushUsed()
+        count = len(self)
+        if count > self.maxEntries:
+            self.connection.execute("DELETE FROM analysis WHERE key IN (SELECT key FROM analysis ORDER BY used LIMIT ?)", (count - int(self.maxEntries * EVICT_TO),))
+
+    def clear(self):
+        self.touched.clear()
+        self.connection.execute("DELETE FROM analysis")
+        self.connection.execute("VACUUM")
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description = "Analysis cache")
+    parser.add_argument("command", choices = ["stats", "probe", "clear"])
+    parser.add_argument("--file", default = DEFAULT_FILE)
+    parser.add_argument("--fen", help = "position to probe")
+    args = parser.parse_args()
+    cache = AnalysisCache(args.file)
+    if args.command == "stats":
+        print("positions", len(cache), "of", cache.maxEntries)
+        for depth, count in cache.connection.execute("SELECT depth, COUNT(*) FROM analysis GROUP BY depth ORDER BY depth"):
+            print("depth %2d %8d" % (depth, count))
+    elif args.command == "probe":
+        gs = ChessEngine.GameState()
+        if args.fen:
+            gs.loadFEN(args.fen)
+        entry = cache.probe(gs.zobristKey)
+        if entry is None:
+            print("not in the cache")
+        else:
+            print("depth %d score %d move %s nodes %d seconds %.2f" % entry)
+    else:
+        cache.clear()
+    cache.close()
+
+if __name__ == "__main__":
+    main()
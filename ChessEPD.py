@@ -0,0 +1,175 @@
+#EPD file: in charge of running test suites of positions with best (bm) or avoid (am) moves, like WAC or ECM
+#usage: python ChessEPD.py wac.epd [--time 1.0 | --depth 6] [--workers N] [--engine KEY=VALUE...] [--out results.json] [--compare old.json]
+import argparse
+import concurrent.futures
+import json
+import os
+import shlex
+import time
+import ChessEngine, ChessAI, ChessPGN, ChessSelfPlay
+
+#(FEN, operations) of an EPD line, operations maps each opcode to its operands, None for lines without a position
+#the clocks come from the hmvc and fmvn operations when present
+def parseEPD(line):
+    fields = line.split(None, 4)
+    if len(fields) < 4 or fields[0].startswith("#"):
+        return None
+    operations = {}
+    for operation in splitOperations(fields[4] if len(fields) > 4 else ""):
+        try:
+            tokens = shlex.split(operation)
+        except ValueError: #an unmatched quote
+            tokens = operation.split()
+        if tokens:
+            operations[tokens[0]] = tokens[1:]
+    fen = " ".join(fields[:4] + [operations.get("hmvc", ["0"])[0], operations.get("fmvn", ["1"])[0]])
+    return fen, operations
+
+#operations end at semicolons outside quoted strings
+def splitOperations(text):
+    operations = []
+    current = ""
+    quoted = False
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif ch == ';' and not quoted:
+            operations.append(current)
+            current = ""
+            continue
+        current += ch
+    if current.strip():
+        operations.append(current)
+    return operations
+
+#the positions of a suite that have a bm or am operation: (id, FEN, bm moves, am moves)
+def readSuite(path):
+    positions = []
+    with open(path, encoding = "utf-8", errors = "replace") as suiteFile:
+        for line in suiteFile:
+            parsed = parseEPD(line)
+            if parsed is None:
+                continue
+            fen, operations = parsed
+            if "bm" in operations or "am" in operations:
+                positionID = " ".join(operations.get("id", [])) or str(len(positions) + 1)
+                positions.append((positionID, fen, operations.get("bm", []), operations.get("am", [])))
+    return positions
+
+#runs in a worker: searches one position and returns its result
+#time to solution is when the search settled on a solving move, the first completed depth from which every
+#later depth picked one. results of positions the AI did not solve have None there
+def solvePosition(index, position, timeLimit, depth, config):
+    positionID, fen, bestSANs, avoidSANs = position
+    ChessAI.USE_BOOK = False
+    ChessAI.USE_ANALYSIS_CACHE = False
+    for key, value in config.items():
+        setattr(ChessAI, key, value)
+    ChessAI.applyTunedWeights() #before the position is set up, a TUNED_WEIGHTS setting changes how it is scored
+    ChessAI.transpositionTable.clear()
+    for piece in ChessAI.historyTable:
+        ChessAI.historyTable[piece] = [0] * 64
+    gs = ChessEngine.GameState()
+    gs.loadFEN(fen)
+    validMoves = gs.getValidMoves()
+    result = {"index": index, "id": positionID, "fen": fen, "bm": bestSANs, "am": avoidSANs}
+    bestMoves = [ChessPGN.parseSAN(gs, san, validMoves) for san in bestSANs]
+    avoidMoves = [ChessPGN.parseSAN(gs, san, validMoves) for san in avoidSANs]
+    if None in bestMoves + avoidMoves or len(validMoves) == 0:
+        result["error"] = "bm or am is not a legal move"
+        return result
+    def isSolution(move):
+        return move is not None and (move in bestMoves if bestMoves else True) and move not in avoidMoves
+    iterations = [] #(depth, nodes, seconds, move) of every completed depth
+    def onIteration(info):
+        iterations.append((info['depth'], info['nodes'], info['time'], info['pv'][0] if info['pv'] else None))
+    startTime = time.time()
+    move = ChessAI.findBestMove(gs, list(validMoves), timeLimit = timeLimit, depthLimit = depth, onIteration = onIteration)
+    elapsed = time.time() - startTime
+    result.update(move = ChessPGN.getSAN(gs, move, validMoves) if move is not None else None, solved = isSolution(move),
+                  depth = ChessAI.searchInfo.get('depth', 0), score = ChessAI.searchInfo.get('score', 0), nodes = ChessAI.nodes, time = round(elapsed, 3),
+                  solveDepth = None, solveNodes = None, solveTime = None)
+    if result["solved"]:
+        settled = len(iterations)
+        while settled > 0 and isSolution(iterations[settled - 1][3]):
+            settled -= 1
+        if settled < len(iterations):
+            result.update(solveDepth = iterations[settled][0], solveNodes = iterations[settled][1], solveTime = round(iterations[settled][2], 3))
+        else: #book or tablebase move
+            result.update(solveDepth = 0, solveNodes = 0, solveTime = round(elapsed, 3))
+    return result
+
+def runSuite(positions, timeLimit, depth, config, workers):
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(solvePosition, i, position, timeLimit, depth, config) for i, position in enumerate(positions)]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if "error" in result:
+                print("%-12s %s" % (result["id"], result["error"]))
+            else:
+                print("%-12s %-8s %-6s bm %s%s depth %d nodes %d%s" % (result["id"], "solved" if result["solved"] else "failed", result["move"],
+                      " ".join(result["bm"]) or "-", " am " + " ".join(result["am"]) if result["am"] else "", result["depth"], result["nodes"],
+                      " solved at depth %d after %.2fs %d nodes" % (result["solveDepth"], result["solveTime"], result["solveNodes"]) if result["solved"] else ""))
+    results.sort(key = lambda result: result["index"])
+    return results
+
+def summary(results):
+    solved = [result for result in results if result.get("solved")]
+    return {"total": len(results), "solved": len(solved),
+            "solveTime": round(sum(result["solveTime"] for result in solved), 3),
+            "solveNodes": sum(result["solveNodes"] for result in solved),
+            "time": round(sum(result.get("time", 0) for result in results), 3),
+            "nodes": sum(result.get("nodes", 0) for result in results)}
+
+#positions one run solved and the other did not, and the time and nodes to solution over positions both solved
+def compareResults(old, new):
+    oldResults = {result["id"]: result for result in old["results"]}
+    bothTime = [0.0, 0.0]
+    bothNodes = [0, 0]
+    for result in new["results"]:
+        before = oldResults.get(result["id"])
+        if before is None:
+            continue
+        if before.get("solved") and not result.get("solved"):
+            print("no longer solved", result["id"], result["fen"])
+        elif result.get("solved") and not before.get("solved"):
+            print("newly solved", result["id"], result["fen"])
+        elif result.get("solved"):
+            bothTime[0] += before["solveTime"]
+            bothTime[1] += result["solveTime"]
+            bothNodes[0] += before["solveNodes"]
+            bothNodes[1] += result["solveNodes"]
+    print("solved %d -> %d of %d" % (old["summary"]["solved"], new["summary"]["solved"], new["summary"]["total"]))
+    print("solved by both: time to solution %.2fs -> %.2fs, nodes to solution %d -> %d" % (bothTime[0], bothTime[1], bothNodes[0], bothNodes[1]))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Run an EPD test suite with bm/am operations")
+    parser.add_argument("suite")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument("--time", type = float, help = "seconds per position, the default is 1")
+    limit.add_argument("--depth", type = int, help = "fixed depth per position")
+    parser.add_argument("--workers", type = int, default = os.cpu_count() or 1, help = "with a time limit, more workers than cores take time from each other")
+    parser.add_argument("--engine", nargs = "*", default = [], help = "KEY=VALUE overrides of ChessAI settings")
+    parser.add_argument("--out", help = "write the results as JSON")
+    parser.add_argument("--compare", metavar = "PATH", help = "results of an earlier run to compare with")
+    args = parser.parse_args()
+    timeLimit = args.time if args.time is not None or args.depth is not None else 1.0
+    config = {key: value for key, value in ChessSelfPlay.parseEngineConfig(args.engine).items() if key.isupper()}
+    positions = readSuite(args.suite)
+    startTime = time.time()
+    results = runSuite(positions, timeLimit, args.depth, config, args.workers)
+    report = {"suite": os.path.basename(args.suite), "date": time.strftime("%Y-%m-%d %H:%M:%S"), "time": timeLimit, "depth": args.depth,
+              "engine": config, "summary": summary(results), "results": results}
+    print("solved %d of %d, time to solution %.2fs, nodes to solution %d, wall time %.1fs" % (report["summary"]["solved"], report["summary"]["total"],
+          report["summary"]["solveTime"], report["summary"]["solveNodes"], time.time() - startTime))
+    if args.out:
+        with open(args.out, "w") as outFile:
+            json.dump(report, outFile, indent = 1)
+    if args.compare:
+        with open(args.compare) as oldFile:
+            compareResults(json.load(oldFile), report)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,232 @@
 # Engine file: in charge of game rules and move related data
+import random
+
+#bitboard squares are numbered row * 8 + col, so square 0 is a8 and square 63 is h1
+SQUARES = [(sq // 8, sq % 8) for sq in range(64)]
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KNIGHT_OFFSETS = ((-2, 1), (-2, -1), (2, 1), (2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+KING_OFFSETS = ((1, 0), (1, 1), (1, -1), (-1, 0), (-1, 1), (-1, -1), (0, 1), (0, -1))
+
+def buildLeaperAttacks(offsets):
+    attacks = []
+    for r, c in SQUARES:
+        bits = 0
+        for d in offsets:
+            if 0 <= r + d[0] < 8 and 0 <= c + d[1] < 8:
+                bits |= 1 << ((r + d[0]) * 8 + c + d[1])
+        attacks.append(bits)
+    return attacks
+
+def buildRays(d):
+    rays = []
+    for r, c in SQUARES:
+        bits = 0
+        for i in range(1, 8):
+            if not (0 <= r + d[0] * i < 8 and 0 <= c + d[1] * i < 8):
+                break
+            bits |= 1 << ((r + d[0] * i) * 8 + c + d[1] * i)
+        rays.append(bits)
+    return rays
+
+KNIGHT_ATTACKS = buildLeaperAttacks(KNIGHT_OFFSETS)
+KING_ATTACKS = buildLeaperAttacks(KING_OFFSETS)
+PAWN_ATTACKS = {'w': buildLeaperAttacks(((-1, -1), (-1, 1))), 'b': buildLeaperAttacks(((1, -1), (1, 1)))} #squares a pawn of that color attacks
+#(rays, True if the ray runs towards higher squares so the nearest blocker is the lowest bit)
+ROOK_RAYS = [(buildRays(d), d[0] > 0 or (d[0] == 0 and d[1] > 0)) for d in ROOK_DIRECTIONS]
+BISHOP_RAYS = [(buildRays(d), d[0] > 0) for d in BISHOP_DIRECTIONS]
+#squares strictly between two squares on the same rank, file or diagonal
+BETWEEN = [[0] * 64 for sq in range(64)]
+for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+    for r, c in SQUARES:
+        bits = 0
+        for i in range(1, 8):
+            if not (0 <= r + d[0] * i < 8 and 0 <= c + d[1] * i < 8):
+                break
+            BETWEEN[r * 8 + c][(r + d[0] * i) * 8 + c + d[1] * i] = bits
+            bits |= 1 << ((r + d[0] * i) * 8 + c + d[1] * i)
+
+def slidingAttacks(sq, occupied, rays):
+    attacks = 0
+    for ray, increasing in rays:
+        bits = ray[sq]
+        blockers = bits & occupied
+        if blockers:
+            if increasing:
+                bits ^= ray[(blockers & -blockers).bit_length() - 1]
+            else:
+                bits ^= ray[blockers.bit_length() - 1]
+        attacks |= bits
+    return attacks
+
+def rookAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, ROOK_RAYS)
+
+def bishopAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, BISHOP_RAYS)
+
+#squares a rook or bishop would attack on an empty board, a slider off these lines cannot attack the square
+ROOK_LINES = [rookAttacks(sq, 0) for sq in range(64)]
+BISHOP_LINES = [bishopAttacks(sq, 0) for sq in range(64)]
+
+#castling rights are kept as a 4-bit mask
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING = 15
+#rights that survive a move from or to each square: a king or rook leaving home, or a rook captured there, loses them
+CASTLING_MASKS = [ALL_CASTLING] * 64
+CASTLING_MASKS[56] = ALL_CASTLING & ~WHITE_QUEENSIDE
+CASTLING_MASKS[63] = ALL_CASTLING & ~WHITE_KINGSIDE
+CASTLING_MASKS[60] = ALL_CASTLING & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASKS[0] = ALL_CASTLING & ~BLACK_QUEENSIDE
+CASTLING_MASKS[7] = ALL_CASTLING & ~BLACK_KINGSIDE
+CASTLING_MASKS[4] = ALL_CASTLING & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+
+#zobrist keys: one random number per piece and square, side to move, castling right and en passant file
+zobristRandom = random.Random(2023) #fixed seed so keys are the same in every process
+ZOBRIST_PIECES = {color + piece: [zobristRandom.getrandbits(64) for sq in range(64)] for color in 'wb' for piece in 'PRNBQK'}
+ZOBRIST_BLACK_MOVE = zobristRandom.getrandbits(64)
+ZOBRIST_CASTLING_RIGHTS = [zobristRandom.getrandbits(64) for right in range(4)]
+ZOBRIST_CASTLING = [0] * 16 #key of every castling rights mask
+for rights in range(16):
+    for right in range(4):
+        if rights & (1 << right):
+            ZOBRIST_CASTLING[rights] ^= ZOBRIST_CASTLING_RIGHTS[right]
+ZOBRIST_EP_FILE = [zobristRandom.getrandbits(64) for col in range(8)]
+
+#tapered evaluation: middlegame and endgame value of every piece plus a piece-square bonus, in centipawns
+#tables are from white's side with a8 first, black pieces use the mirrored square (sq ^ 56)
+MG_PIECE_VALUES = {'P': 82, 'N': 337, 'B': 365, 'R': 477, 'Q': 1025, 'K': 0}
+EG_PIECE_VALUES = {'P': 94, 'N': 281, 'B': 297, 'R': 512, 'Q': 936, 'K': 0}
+PHASE_WEIGHTS = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0} #all pieces on the board add up to TOTAL_PHASE
+TOTAL_PHASE = 24
+MG_PIECE_SQUARE_TABLES = {
+    'P': [   0,   0,   0,   0,   0,   0,   0,   0,
+            98, 134,  61,  95,  68, 126,  34, -11,
+            -6,   7,  26,  31,  65,  56,  25, -20,
+           -14,  13,   6,  21,  23,  12,  17, -23,
+           -27,  -2,  -5,  12,  17,   6,  10, -25,
+           -26,  -4,  -4, -10,   3,   3,  33, -12,
+           -35,  -1, -20, -23, -15,  24,  38, -22,
+             0,   0,   0,   0,   0,   0,   0,   0],
+    'N': [-167, -89, -34, -49,  61, -97, -15,-107,
+           -73, -41,  72,  36,  23,  62,   7, -17,
+           -47,  60,  37,  65,  84, 129,  73,  44,
+            -9,  17,  19,  53,  37,  69,  18,  22,
+           -13,   4,  16,  13,  28,  19,  21,  -8,
+           -23,  -9,  12,  10,  19,  17,  25, -16,
+           -29, -53, -12,  -3,  -1,  18, -14, -19,
+          -105, -21, -58, -33, -17, -28, -19, -23],
+    'B': [ -29,   4, -82, -37, -25, -42,   7,  -8,
+           -26,  16, -18, -13,  30,  59,  18, -47,
+           -16,  37,  43,  40,  35,  50,  37,  -2,
+            -4,   5,  19,  50,  37,  37,   7,  -2,
+            -6,  13,  13,  26,  34,  12,  10,   4,
+             0,  15,  15,  15,  14,  27,  18,  10,
+             4,  15,  16,   0,   7,  21,  33,   1,
+           -33,  -3, -14, -21, -13, -12, -39, -21],
+    'R': [  32,  42,  32,  51,  63,   9,  31,  43,
+            27,  32,  58,  62,  80,  67,  26,  44,
+            -5,  19,  26,  36,  17,  45,  61,  16,
+           -24, -11,   7,  26,  24,  35,  -8, -20,
+           -36, -26, -12,  -1,   9,  -7,   6, -23,
+           -45, -25, -16, -17,   3,   0,  -5, -33,
+           -44, -16, -20,  -9,  -1,  11,  -6, -71,
+           -19, -13,   1,  17,  16,   7, -37, -26],
+    'Q': [ -28,   0,  29,  12,  59,  44,  43,  45,
+           -24, -39,  -5,   1, -16,  57,  28,  54,
+           -13, -17,   7,   8,  29,  56,  47,  57,
+           -27, -27, -16, -16,  -1,  17,  -2,   1,
+            -9, -26,  -9, -10,  -2,  -4,   3,  -3,
+           -14,   2, -11,  -2,  -5,   2,  14,   5,
+           -35,  -8,  11,   2,   8,  15,  -3,   1,
+            -1, -18,  -9,  10, -15, -25, -31, -50],
+    'K': [ -65,  23,  16, -15, -56, -34,   2,  13,
+            29,  -1, -20,  -7,  -8,  -4, -38, -29,
+            -9,  24,   2, -16, -20,   6,  22, -22,
+           -17, -20, -12, -27, -30, -25, -14, -36,
+           -49,  -1, -27, -39, -46, -44, -33, -51,
+           -14, -14, -22, -46, -44, -30, -15, -27,
+             1,   7,  -8, -64, -43, -16,   9,   8,
+           -15,  36,  12, -54,   8, -28,  24,  14]}
+EG_PIECE_SQUARE_TABLES = {
+    'P': [   0,   0,   0,   0,   0,   0,   0,   0,
+           178, 173, 158, 134, 147, 132, 165, 187,
+            94, 100,  85,  67,  56,  53,  82,  84,
+            32,  24,  13,   5,  -2,   4,  17,  17,
+            13,   9,  -3,  -7,  -7,  -8,   3,  -1,
+             4,   7,  -6,   1,   0,  -5,  -1,  -8,
+            13,   8,   8,  10,  13,   0,   2,  -7,
+             0,   0,   0,   0,   0,   0,   0,   0],
+    'N': [ -58, -38, -13, -28, -31, -27, -63, -99,
+           -25,  -8, -25,  -2,  -9, -25, -24, -52,
+           -24, -20,  10,   9,  -1,  -9, -19, -41,
+           -17,   3,  22,  22,  22,  11,   8, -18,
+           -18,  -6,  16,  25,  16,  17,   4, -18,
+           -23,  -3,  -1,  15,  10,  -3, -20, -22,
+           -42, -20, -10,  -5,  -2, -20, -23, -44,
+           -29, -51, -23, -15, -22, -18, -50, -64],
+    'B': [ -14, -21, -11,  -8,  -7,  -9, -17, -24,
+            -8,  -4,   7, -12,  -3, -13,  -4, -14,
+             2,  -8,   0,  -1,  -2,   6,   0,   4,
+            -3,   9,  12,   9,  14,  10,   3,   2,
+            -6,   3,  13,  19,   7,  10,  -3,  -9,
+           -12,  -3,   8,  10,  13,   3,  -7, -15,
+           -14, -18,  -7,  -1,   4,  -9, -15, -27,
+           -23,  -9, -23,  -5,  -9, -16,  -5, -17],
+    'R': [  13,  10,  18,  15,  12,  12,   8,   5,
+            11,  13,  13,  11,  -3,   3,   8,   3,
+             7,   7,   7,   5,   4,  -3,  -5,  -3,
+             4,   3,  13,   1,   2,   1,  -1,   2,
+             3,   5,   8,   4,  -5,  -6,  -8, -11,
+            -4,   0,  -5,  -1,  -7, -12,  -8, -16,
+            -6,  -6,   0,   2,  -9,  -9, -11,  -3,
+            -9,   2,   3,  -1,  -5, -13,   4, -20],
+    'Q': [  -9,  22,  22,  27,  27,  19,  10,  20,
+           -17,  20,  32,  41,  58,  25,  30,   0,
+           -20,   6,   9,  49,  47,  35,  19,   9,
+             3,  22,  24,  45,  57,  40,  57,  36,
+           -18,  28,  19,  47,  31,  34,  39,  23,
+           -16, -27,  15,   6,   9,  17,  10,   5,
+           -22, -23, -30, -16, -16, -23, -36, -32,
+           -33, -28, -22, -43,  -5, -32, -20, -41],
+    'K': [ -74, -35, -18, -18, -11,  15,   4, -17,
+           -12,  17,  14,  17,  17,  38,  23,  11,
+            10,  17,  23,  15,  20,  45,  44,  13,
+            -8,  22,  24,  27,  26,  33,  26,   3,
+           -18,  -4,  21,  24,  27,  23,   9, -11,
+           -19,  -3,  11,  21,  23,  16,   7,  -9,
+           -27, -11,   4,  13,  14,   4,  -5, -17,
+           -53, -34, -21, -11, -28, -14, -24, -43]}
+
+#score of each piece on each square as white minus black, what makeMove and undoMove add and subtract
+def buildSquareScores(pieceValues, pieceSquareTables):
+    scores = {}
+    for piece in 'PRNBQK':
+        scores['w' + piece] = [pieceValues[piece] + pieceSquareTables[piece][sq] for sq in range(64)]
+        scores['b' + piece] = [-pieceValues[piece] - pieceSquareTables[piece][sq ^ 56] for sq in range(64)]
+    return scores
+
+MG_SQUARE_SCORES = buildSquareScores(MG_PIECE_VALUES, MG_PIECE_SQUARE_TABLES)
+EG_SQUARE_SCORES = buildSquareScores(EG_PIECE_VALUES, EG_PIECE_SQUARE_TABLES)
+
+#pieces a pawn can promote to, queen first so it is tried first
+PROMOTION_PIECES = 'QRBN'
+
+#every distinct move is built once and then shared by all positions, moves are never changed after they are built
+MOVE_CACHE = {}
+PIECE_CODES = {piece: code for code, piece in enumerate(["--", "wP", "wR", "wN", "wB", "wQ", "wK", "bP", "bR", "bN", "bB", "bQ", "bK"])}
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+LIGHT_SQUARES = sum(1 << sq for sq in range(64) if (sq // 8 + sq % 8) % 2 == 0)
+DARK_SQUARES = ~LIGHT_SQUARES & ((1 << 64) - 1)
+
+#yields the square of every set bit
+def bitSquares(bits):
+    while bits:
+        bit = bits & -bits
+        yield bit.bit_length() - 1
+        bits ^= bit
 
 class GameState():
     def __init__(self):
@@ -22,11 +250,125 @@ class GameState():
         self.checkmate = False
         self.stalemate = False
         self.enPassantPossible = () 
-        self.currentCastlingRight = CastleRights(True, True, True, True)
-        self.castleRightsLog = [CastleRights(self.currentCastlingRight.wKs, self.currentCastlingRight.wQs, self.currentCastlingRight.bQs, self.currentCastlingRight.bKs)]
+        self.pins = {} #pinned square of the side to move -> squares it may still move to
+        self.checks = 0 #bitboard of pieces giving check to the side to move
+        self.castlingRights = ALL_CASTLING
+        self.halfmoveClock = 0 #moves since the last capture or pawn move
+        self.stateLog = [] #(castlingRights, enPassantPossible, zobristKey, halfmoveClock) before each move in moveLog
+        self.loadBitboards()
+
+    #sets up the position from a FEN string, the fullmove counter is ignored
+    def loadFEN(self, fen):
+        fields = fen.split()
+        ranks = fields[0].split('/')
+        if len(ranks) != 8:
+            raise ValueError("FEN needs 8 ranks: " + fen)
+        self.board = []
+        for rank in ranks:
+            row = []
+            for ch in rank:
+                if ch.isdigit():
+                    row += ["--"] * int(ch)
+                else:
+                    row.append(('w' if ch.isupper() else 'b') + ch.upper())
+            if len(row) != 8:
+                raise ValueError("FEN rank needs 8 squares: " + rank)
+            self.board.append(row)
+        self.whiteMove = len(fields) < 2 or fields[1] == 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        self.castlingRights = (WHITE_KINGSIDE if 'K' in castling else 0) | (WHITE_QUEENSIDE if 'Q' in castling else 0) | \
+                              (BLACK_KINGSIDE if 'k' in castling else 0) | (BLACK_QUEENSIDE if 'q' in castling else 0)
+        epSquare = fields[3] if len(fields) > 3 else '-'
+        self.enPassantPossible = () if epSquare == '-' else (Move.ranksToRows[epSquare[1]], Move.filesToCols[epSquare[0].upper()])
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+        self.moveLog = []
+        self.stateLog = []
+        self.checkmate = False
+        self.stalemate = False
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] == 'wK':
+                    self.wK_Location = (r, c)
+                elif self.board[r][c] == 'bK':
+                    self.bK_Location = (r, c)
+        self.loadBitboards()
+
+    #FEN string of the position, the fullmove counter is only estimated from the move log
+    def getFEN(self):
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece[1] if piece[0] == 'w' else piece[1].lower()
+            ranks.append(rank + (str(empty) if empty else ""))
+        castling = ("K" if self.castlingRights & WHITE_KINGSIDE else "") + ("Q" if self.castlingRights & WHITE_QUEENSIDE else "") + \
+                   ("k" if self.castlingRights & BLACK_KINGSIDE else "") + ("q" if self.castlingRights & BLACK_QUEENSIDE else "")
+        epSquare = "-"
+        if self.enPassantPossible != ():
+            epSquare = (Move.colsToFiles[self.enPassantPossible[1]] + Move.rowsToRanks[self.enPassantPossible[0]]).lower()
+        return " ".join(["/".join(ranks), 'w' if self.whiteMove else 'b', castling or "-", epSquare, str(self.halfmoveClock), str(len(self.moveLog) // 2 + 1)])
+
+    #rebuilds the piece bitboards, occupancy masks and zobrist key from self.board
+    def loadBitboards(self):
+        self.bitboards = {color + piece: 0 for color in 'wb' for piece in 'PRNBQK'}
+        self.occupancy = {'w': 0, 'b': 0}
+        self.zobristKey = 0
+        self.mgScore = 0 #middlegame and endgame evaluation, white minus black
+        self.egScore = 0
+        self.phase = 0 #TOTAL_PHASE with every piece on the board, 0 with only kings and pawns
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] != "--":
+                    self.flipPiece(self.board[r][c], r * 8 + c)
+        self.zobristKey = self.computeZobristKey()
+
+    #adds or removes a piece on a square in the bitboards, zobrist key and evaluation
+    def flipPiece(self, piece, sq):
+        self.bitboards[piece] ^= 1 << sq
+        self.occupancy[piece[0]] ^= 1 << sq
+        self.zobristKey ^= ZOBRIST_PIECES[piece][sq]
+        if self.bitboards[piece] & (1 << sq): #added
+            self.mgScore += MG_SQUARE_SCORES[piece][sq]
+            self.egScore += EG_SQUARE_SCORES[piece][sq]
+            self.phase += PHASE_WEIGHTS[piece[1]]
+        else:
+            self.mgScore -= MG_SQUARE_SCORES[piece][sq]
+            self.egScore -= EG_SQUARE_SCORES[piece][sq]
+            self.phase -= PHASE_WEIGHTS[piece[1]]
+
+    #zobrist key of the castling rights and en passant file, which are xored out and back in around every move
+    def stateZobristKey(self):
+        key = ZOBRIST_CASTLING[self.castlingRights]
+        if self.enPassantPossible != ():
+            key ^= ZOBRIST_EP_FILE[self.enPassantPossible[1]]
+        return key
+
+    #full recomputation of the zobrist key, makeMove and undoMove keep it up to date incrementally
+    def computeZobristKey(self):
+        key = self.stateZobristKey()
+        for piece in self.bitboards:
+            for sq in bitSquares(self.bitboards[piece]):
+                key ^= ZOBRIST_PIECES[piece][sq]
+        if not self.whiteMove:
+            key ^= ZOBRIST_BLACK_MOVE
+        return key
 
     #takes move changes and initializes the move
     def makeMove(self, move):
+        self.stateLog.append((self.castlingRights, self.enPassantPossible, self.zobristKey, self.halfmoveClock))
+        self.zobristKey ^= self.stateZobristKey() ^ ZOBRIST_BLACK_MOVE
+        self.flipPiece(move.pieceMoved, move.startRow * 8 + move.startCol)
+        self.flipPiece(move.pieceMoved, move.endRow * 8 + move.endCol)
+        if move.pieceCaptured != "--":
+            capturedRow = move.startRow if move.isEnpassantMove else move.endRow
+            self.flipPiece(move.pieceCaptured, capturedRow * 8 + move.endCol)
         self.board[move.startRow][move.startCol] = "--"
         self.board[move.endRow][move.endCol] = move.pieceMoved  
         self.moveLog.append(move) #log for future use
@@ -39,8 +381,9 @@ class GameState():
 
         #pawn promotion
         if move.isPawnPromotion:
-            #promotedPiece = input("Promote to Q, R, B, or N")
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + 'Q'
+            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + move.promotionChoice
+            self.flipPiece(move.pieceMoved, move.endRow * 8 + move.endCol)
+            self.flipPiece(move.pieceMoved[0] + move.promotionChoice, move.endRow * 8 + move.endCol)
         
         #enpassant
         if move.isEnpassantMove:
@@ -56,16 +399,30 @@ class GameState():
             if move.endCol - move.startCol == 2: #king side castle
                 self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1] #moves rook
                 self.board[move.endRow][move.endCol + 1] = '--' #update space
+                self.flipPiece(self.board[move.endRow][move.endCol - 1], move.endRow * 8 + move.endCol - 1)
+                self.flipPiece(self.board[move.endRow][move.endCol - 1], move.endRow * 8 + move.endCol + 1)
             else: #queen side castle
                 self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2] #moves rook
                 self.board[move.endRow][move.endCol - 2] = '--' #update space
+                self.flipPiece(self.board[move.endRow][move.endCol + 1], move.endRow * 8 + move.endCol + 1)
+                self.flipPiece(self.board[move.endRow][move.endCol + 1], move.endRow * 8 + move.endCol - 2)
 
-        self.updateCastleRights(move)
-        self.castleRightsLog.append(CastleRights(self.currentCastlingRight.wKs, self.currentCastlingRight.wQs, self.currentCastlingRight.bQs, self.currentCastlingRight.bKs))
+        self.halfmoveClock = 0 if move.pieceMoved[1] == 'P' or move.pieceCaptured != '--' else self.halfmoveClock + 1
+        self.castlingRights &= CASTLING_MASKS[move.startRow * 8 + move.startCol] & CASTLING_MASKS[move.endRow * 8 + move.endCol]
+        self.zobristKey ^= self.stateZobristKey()
 
     def undoMove(self):
         if len(self.moveLog) != 0:
             move = self.moveLog.pop()
+            self.castlingRights, self.enPassantPossible, zobristKey, self.halfmoveClock = self.stateLog.pop()
+            if move.isPawnPromotion:
+                self.flipPiece(move.pieceMoved[0] + move.promotionChoice, move.endRow * 8 + move.endCol)
+                self.flipPiece(move.pieceMoved, move.endRow * 8 + move.endCol)
+            self.flipPiece(move.pieceMoved, move.startRow * 8 + move.startCol)
+            self.flipPiece(move.pieceMoved, move.endRow * 8 + move.endCol)
+            if move.pieceCaptured != "--":
+                capturedRow = move.startRow if move.isEnpassantMove else move.endRow
+                self.flipPiece(move.pieceCaptured, capturedRow * 8 + move.endCol)
             self.board[move.startRow][move.startCol] = move.pieceMoved
             self.board[move.endRow][move.endCol] = move.pieceCaptured
             self.whiteMove = not self.whiteMove
@@ -79,233 +436,273 @@ class GameState():
             if move.isEnpassantMove:
                 self.board[move.endRow][move.endCol] = '--'
                 self.board[move.startRow][move.endCol] = move.pieceCaptured
-                self.enPassantPossible = (move.endRow, move.endCol)
-            if move.pieceMoved[1] == 'P' and abs(move.startRow - move.endRow) == 2:
-                self.enPassantPossible = ()
 
             #undo for castling
-            self.castleRightsLog.pop()
-            newRights = self.castleRightsLog[-1]
-            self.currentCastlingRight = CastleRights(newRights.wKs, newRights.wQs, newRights.bKs, newRights.bQs,) 
             if move.isCastleMove:
                 if move.endCol - move.startCol == 2: #king side
                     self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 1] #moves rook
                     self.board[move.endRow][move.endCol - 1] = '--' #update space
+                    self.flipPiece(self.board[move.endRow][move.endCol + 1], move.endRow * 8 + move.endCol - 1)
+                    self.flipPiece(self.board[move.endRow][move.endCol + 1], move.endRow * 8 + move.endCol + 1)
                 else: #queen side
                     self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][move.endCol + 1] #moves rook
                     self.board[move.endRow][move.endCol + 1] = '--' #update space  
+                    self.flipPiece(self.board[move.endRow][move.endCol - 2], move.endRow * 8 + move.endCol + 1)
+                    self.flipPiece(self.board[move.endRow][move.endCol - 2], move.endRow * 8 + move.endCol - 2)
+            self.zobristKey = zobristKey
 
             self.checkmate = False
             self.stalemate = False
-    
-    #can castle
-    def updateCastleRights(self, move):
-        #king movement
-        if move.pieceMoved == 'wK':
-            self.currentCastlingRight.wKs = False
-            self.currentCastlingRight.wQs = False
-        elif move.pieceMoved == 'bK':
-            self.currentCastlingRight.bKs = False
-            self.currentCastlingRight.bQs = False
-        #rook movements
-        elif move.pieceMoved == 'wR': #white rooks
-            if move.startRow == 7:
-                if move.startCol == 0 : #left side rook
-                    self.currentCastlingRight.wQs = False
-                elif move.startCol == 7 : #right side rook
-                    self.currentCastlingRight.wKs = False
-        elif move.pieceMoved == 'bR': #black rooks
-            if move.startRow == 0:
-                if move.startCol == 0 : #left side rook
-                    self.currentCastlingRight.bQs = False
-                elif move.startCol == 7 : #right side rook
-                    self.currentCastlingRight.bKs = False    
-        #if a rook is captured
-        if move.pieceCaptured == 'wR':
-            if move.endRow == 7:
-                if move.endCol == 0:
-                    self.currentCastlingRight.wQs = False
-                elif move.endCol == 7:
-                    self.currentCastlingRight.wKs = False
-        elif move.pieceCaptured == 'bR':
-            if move.endRow == 0:
-                if move.endCol == 0:
-                    self.currentCastlingRight.bQs = False
-                elif move.endCol == 7:
-                    self.currentCastlingRight.bKs = False        
+
+    #passes the turn without moving, for null-move pruning in the search. moveLog gets None until undoNullMove
+    def makeNullMove(self):
+        self.stateLog.append((self.castlingRights, self.enPassantPossible, self.zobristKey, self.halfmoveClock))
+        self.zobristKey ^= self.stateZobristKey() ^ ZOBRIST_BLACK_MOVE
+        self.enPassantPossible = ()
+        self.halfmoveClock = 0 #repetitions are not looked for across a null move
+        self.zobristKey ^= self.stateZobristKey()
+        self.moveLog.append(None)
+        self.whiteMove = not self.whiteMove
+
+    def undoNullMove(self):
+        self.moveLog.pop()
+        self.castlingRights, self.enPassantPossible, self.zobristKey, self.halfmoveClock = self.stateLog.pop()
+        self.whiteMove = not self.whiteMove
+        self.checkmate = False
+        self.stalemate = False
 
     def getValidMoves(self):
-        tempEnpassantPossible = self.enPassantPossible
-        tempCastleRights = CastleRights(self.currentCastlingRight.wKs, self.currentCastlingRight.wQs, self.currentCastlingRight.bKs, self.currentCastlingRight.bQs, )
-        moves = self.allPossibleMoves()
-        for i in range(len(moves) -1, -1, -1):
-            self.makeMove(moves[i])
-            self.whiteMove = not self.whiteMove
-            if self.inCheck():
-                moves.remove(moves[i])
-            self.whiteMove = not self.whiteMove
-            self.undoMove()
-        if len(moves) == 0:
-            if self.inCheck():
-                self.checkmate = True
-            else:
-                self.stalemate = True
-        if self.whiteMove:
-            self.getCastleMoves(self.wK_Location[0], self.wK_Location[1], moves)
+        moves = []
+        allyColor = "w" if self.whiteMove else "b"
+        kingSq = (self.bitboards[allyColor + 'K']).bit_length() - 1
+        self.pins, self.checks = self.checkForPinsAndChecks(kingSq)
+        if self.checks == 0:
+            self.allPossibleMoves(~self.occupancy[allyColor], ~self.occupancy[allyColor], moves)
+            self.getCastleMoves(kingSq, moves)
+        elif self.checks & (self.checks - 1) == 0: #block the check, capture the checker or move the king
+            checkSq = self.checks.bit_length() - 1
+            self.allPossibleMoves(self.checks | BETWEEN[kingSq][checkSq], ~self.occupancy[allyColor], moves)
+        else: #double check, only the king can move
+            self.getKingMoves(kingSq, ~self.occupancy[allyColor], moves)
+        self.checkmate = len(moves) == 0 and self.checks != 0
+        self.stalemate = len(moves) == 0 and self.checks == 0
+        return moves
+
+    #legal captures only, for the quiescence search. checkmate and stalemate are not updated
+    def getCaptureMoves(self):
+        moves = []
+        allyColor = "w" if self.whiteMove else "b"
+        enemies = self.occupancy["b" if self.whiteMove else "w"]
+        kingSq = (self.bitboards[allyColor + 'K']).bit_length() - 1
+        self.pins, self.checks = self.checkForPinsAndChecks(kingSq)
+        if self.checks == 0:
+            self.allPossibleMoves(enemies, enemies, moves)
+        elif self.checks & (self.checks - 1) == 0: #only capturing the checking piece helps
+            self.allPossibleMoves(self.checks, enemies, moves)
         else:
-            self.getCastleMoves(self.bK_Location[0], self.bK_Location[1], moves)
-        self.enPassantPossible = tempEnpassantPossible
-        self.currentCastlingRight = tempCastleRights
+            self.getKingMoves(kingSq, enemies, moves)
         return moves
 
+    #earlier occurrences of the current position with the same side to move
+    #only positions since the last capture or pawn move can repeat, the keys before each move are in stateLog
+    def repetitionCount(self):
+        count = 0
+        n = len(self.stateLog)
+        for i in range(n - 2, max(n - self.halfmoveClock, 0) - 1, -2):
+            if self.stateLog[i][2] == self.zobristKey:
+                count += 1
+        return count
+
+    #for the search: a repeat within the last searchPly plies, or a third occurrence, is a draw
+    def isRepetition(self, searchPly = 0):
+        count = 0
+        n = len(self.stateLog)
+        for i in range(n - 2, max(n - self.halfmoveClock, 0) - 1, -2):
+            if self.stateLog[i][2] == self.zobristKey:
+                if i >= n - searchPly:
+                    return True
+                count += 1
+                if count >= 2:
+                    return True
+        return False
+
+    #neither side can mate: bare kings, a single minor piece, or only bishops all on one square color
+    def isInsufficientMaterial(self):
+        bb = self.bitboards
+        if bb['wP'] | bb['bP'] | bb['wR'] | bb['bR'] | bb['wQ'] | bb['bQ']:
+            return False
+        knights = bb['wN'] | bb['bN']
+        bishops = bb['wB'] | bb['bB']
+        if knights == 0:
+            return bishops & LIGHT_SQUARES == 0 or bishops & DARK_SQUARES == 0
+        return bishops == 0 and knights & (knights - 1) == 0
+
+    #reason the game is drawn by rule, None if it is not, checkmate and stalemate are found by getValidMoves
+    def getDrawReason(self):
+        if self.repetitionCount() >= 2:
+            return "threefold repetition"
+        if self.halfmoveClock >= 100:
+            return "fifty-move rule"
+        if self.isInsufficientMaterial():
+            return "insufficient material"
+        return None
+
     def inCheck(self):
-        if self.whiteMove:
-            return self.sqUnderAttack(self.wK_Location[0], self.wK_Location[1])
-        else:
-            return self.sqUnderAttack(self.bK_Location[0], self.bK_Location[1])
+        allyColor = "w" if self.whiteMove else "b"
+        return self.isAttacked(self.bitboards[allyColor + 'K'].bit_length() - 1, "b" if self.whiteMove else "w")
 
     def sqUnderAttack(self, r, c):
-        self.whiteMove = not self.whiteMove #change turns
-        oppMoves = self.allPossibleMoves()
-        self.whiteMove = not self.whiteMove
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c:
-                return True
-        return False
+        return self.isAttacked(r * 8 + c, "b" if self.whiteMove else "w")
 
-    def allPossibleMoves(self):
-        moves = []
-        for r in range(len(self.board)):
-            for c in range (len(self.board[r])):
-                       turn = self.board[r][c][0]
-                       if (turn == 'w' and self.whiteMove) or (turn == 'b' and not self.whiteMove):
-                            piece = self.board[r][c][1]
-                            self.moveFunctions[piece](r, c, moves) #calls move functions
-        return moves                        
-
-    def getPawnMoves(self, r, c, moves):
-        if self.whiteMove: #white pawns
-            if self.board[r - 1][c] == "--": 
-                moves.append(Move((r, c), (r - 1, c), self.board))
-                if r == 6 and self.board[r - 2][c] == "--":
-                    moves.append(Move((r, c), (r - 2, c), self.board))
-            if c - 1 >= 0:
-                if self.board[r - 1][c - 1][0] == 'b':
-                    moves.append(Move((r, c), (r - 1, c - 1), self.board))
-                elif (r - 1, c - 1) == self.enPassantPossible:
-                    moves.append(Move((r, c), (r - 1, c - 1), self.board, isEnpassantMove = True))
-            if c + 1 <= 7:
-                if self.board[r - 1][c + 1][0] == 'b':
-                    moves.append(Move((r, c), (r - 1, c + 1), self.board))
-                elif (r - 1, c + 1) == self.enPassantPossible:
-                    moves.append(Move((r, c), (r - 1, c + 1), self.board, isEnpassantMove = True))
+    #whether any piece of one color attacks a square, stopping at the first kind of attacker found
+    #sliders are only traced when one of them stands on a line through the square
+    def isAttacked(self, sq, color, occupied = None):
+        bb = self.bitboards
+        if KNIGHT_ATTACKS[sq] & bb[color + 'N'] or PAWN_ATTACKS['b' if color == 'w' else 'w'][sq] & bb[color + 'P'] or \
+           KING_ATTACKS[sq] & bb[color + 'K']:
+            return True
+        if occupied is None:
+            occupied = self.occupancy['w'] | self.occupancy['b']
+        rooks = bb[color + 'R'] | bb[color + 'Q']
+        if ROOK_LINES[sq] & rooks and rookAttacks(sq, occupied) & rooks:
+            return True
+        bishops = bb[color + 'B'] | bb[color + 'Q']
+        return bool(BISHOP_LINES[sq] & bishops and bishopAttacks(sq, occupied) & bishops)
 
-        else:
-            if self.board[r + 1][c] == "--": 
-                moves.append(Move((r, c), (r + 1, c), self.board))
-                if r == 1 and self.board[r + 2][c] == "--":
-                    moves.append(Move((r, c), (r + 2, c), self.board))
-            if c - 1 >= 0:
-                if self.board[r + 1][c - 1][0] == 'w':
-                    moves.append(Move((r, c), (r + 1, c - 1), self.board))
-                elif (r + 1, c - 1) == self.enPassantPossible:
-                    moves.append(Move((r, c), (r + 1, c - 1), self.board, isEnpassantMove = True))
-            if c + 1 <= 7:
-                if self.board[r + 1][c + 1][0] == 'w':
-                    moves.append(Move((r, c), (r + 1, c + 1), self.board))
-                elif (r + 1, c + 1) == self.enPassantPossible:
-                    moves.append(Move((r, c), (r + 1, c + 1), self.board, isEnpassantMove = True))
-
-    def getRookMoves(self, r, c, moves):
-        directions = ( (-1, 0), (1, 0), (0, 1), (0, -1) )        
-        enemyColor = "b" if self.whiteMove else "w"
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0<= endCol < 8: #in bounds
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece == "--":
-                        moves.append(Move( (r, c), (endRow, endCol), self.board))
-                    elif endPiece[0] == enemyColor:
-                        moves.append(Move( (r, c), (endRow, endCol), self.board))
-                        break
-                    else:
-                        break
-                else:
-                    break
+    #bitboard of the pieces of one color attacking a square
+    def attackersTo(self, sq, color, occupied = None):
+        if occupied is None:
+            occupied = self.occupancy['w'] | self.occupancy['b']
+        bb = self.bitboards
+        return (KNIGHT_ATTACKS[sq] & bb[color + 'N']) | (KING_ATTACKS[sq] & bb[color + 'K']) | \
+               (PAWN_ATTACKS['b' if color == 'w' else 'w'][sq] & bb[color + 'P']) | \
+               (rookAttacks(sq, occupied) & (bb[color + 'R'] | bb[color + 'Q'])) | \
+               (bishopAttacks(sq, occupied) & (bb[color + 'B'] | bb[color + 'Q']))
 
-    def getKnightMoves(self, r, c, moves):
-        directions = ((-2, 1), (-2, -1), (2, 1), (2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))   
+    #looks outward from the king for enemy pieces giving check and ally pieces pinned to it
+    def checkForPinsAndChecks(self, kingSq):
+        pins = {}
         allyColor = "w" if self.whiteMove else "b"
-        for d in directions:
-            endRow = r + d[0]
-            endCol = c + d[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8: #in bounds
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColor:
-                    moves.append(Move((r, c), (endRow, endCol), self.board))
-
-    def getBishopMoves(self, r, c, moves):
-        directions = ( (-1,  1), (-1, -1), (1 , -1), (1, 1) )  
         enemyColor = "b" if self.whiteMove else "w"
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0<= endCol < 8: #in bounds
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece == "--":
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
-                    elif endPiece[0] == enemyColor:
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
-                        break
-                    else:
-                        break
-                else:
-                    break
+        enemies = self.occupancy[enemyColor]
+        occupied = enemies | self.occupancy[allyColor]
+        checks = self.attackersTo(kingSq, enemyColor, occupied)
+        bb = self.bitboards
+        #enemy sliders that would attack the king if the ally pieces were removed
+        snipers = (rookAttacks(kingSq, enemies) & (bb[enemyColor + 'R'] | bb[enemyColor + 'Q'])) | \
+                  (bishopAttacks(kingSq, enemies) & (bb[enemyColor + 'B'] | bb[enemyColor + 'Q']))
+        for sniperSq in bitSquares(snipers):
+            between = BETWEEN[kingSq][sniperSq] & occupied
+            if between and between & (between - 1) == 0: #exactly one piece, which must be an ally
+                pins[between.bit_length() - 1] = BETWEEN[kingSq][sniperSq] | (1 << sniperSq)
+        return pins, checks
+
+    #generates moves of every piece except the king onto the target squares, then the king moves onto its own targets
+    def allPossibleMoves(self, targets, kingTargets, moves):
+        allyColor = "w" if self.whiteMove else "b"
+        for piece in 'PNBRQ':
+            for sq in bitSquares(self.bitboards[allyColor + piece]):
+                self.moveFunctions[piece](sq, targets, moves)
+        self.getKingMoves(self.bitboards[allyColor + 'K'].bit_length() - 1, kingTargets, moves)
+        return moves
+
+    #the shared Move for a move on the current board, built the first time it is seen
+    #the piece moved, piece captured and promotion piece also fix whether it is a castle or en passant
+    def getMove(self, sq, toSq, promotionChoice = 'Q', isEnpassantMove = False, isCastleMove = False):
+        board = self.board
+        key = (((sq * 64 + toSq) * 13 + PIECE_CODES[board[sq >> 3][sq & 7]]) * 13 + PIECE_CODES[board[toSq >> 3][toSq & 7]]) * 4 + PROMOTION_PIECES.index(promotionChoice)
+        move = MOVE_CACHE.get(key)
+        if move is None:
+            move = MOVE_CACHE[key] = Move(SQUARES[sq], SQUARES[toSq], board, isEnpassantMove, isCastleMove, promotionChoice)
+        return move
 
-    def getQueenMoves(self, r, c, moves):
-        self.getRookMoves(r, c, moves)
-        self.getBishopMoves(r, c, moves)
+    def addMoves(self, sq, toSquares, moves):
+        if sq in self.pins:
+            toSquares &= self.pins[sq]
+        for toSq in bitSquares(toSquares):
+            moves.append(self.getMove(sq, toSq))
 
-    def getKingMoves(self, r, c, moves):
-        kingMoves = ((1, 0), (1, 1), (1, -1), (-1, 0), (-1, 1), (-1, -1), (0, 1), (0, -1))    
+    def getPawnMoves(self, sq, targets, moves):
         allyColor = "w" if self.whiteMove else "b"
-        for i in range(8):
-            endRow = r + kingMoves[i][0]
-            endCol = c + kingMoves[i][1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8: #in bounds
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] != allyColor:
-                        moves.append(Move((r, c), (endRow, endCol), self.board))     
-
-    def getCastleMoves(self, r, c, moves):
-        if self.sqUnderAttack(r, c):
+        enemyColor = "b" if self.whiteMove else "w"
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        step, startRow = (-8, 6) if self.whiteMove else (8, 1)
+        toSquares = PAWN_ATTACKS[allyColor][sq] & self.occupancy[enemyColor]
+        if not occupied & (1 << (sq + step)):
+            toSquares |= 1 << (sq + step)
+            if sq // 8 == startRow and not occupied & (1 << (sq + 2 * step)):
+                toSquares |= 1 << (sq + 2 * step)
+        toSquares &= targets
+        if sq in self.pins:
+            toSquares &= self.pins[sq]
+        for toSq in bitSquares(toSquares):
+            if toSq < 8 or toSq >= 56: #last rank, one move per promotion piece
+                for choice in PROMOTION_PIECES:
+                    moves.append(self.getMove(sq, toSq, promotionChoice = choice))
+            else:
+                moves.append(self.getMove(sq, toSq))
+        if self.enPassantPossible != ():
+            epSq = self.enPassantPossible[0] * 8 + self.enPassantPossible[1]
+            if PAWN_ATTACKS[allyColor][sq] & (1 << epSq) and self.enpassantIsSafe(sq, epSq):
+                moves.append(self.getMove(sq, epSq, isEnpassantMove = True))
+
+    #both pawns leave the board, which can expose the king along a rank or diagonal
+    def enpassantIsSafe(self, sq, epSq):
+        allyColor = "w" if self.whiteMove else "b"
+        enemyColor = "b" if self.whiteMove else "w"
+        capturedBit = 1 << (epSq + (8 if self.whiteMove else -8))
+        occupied = ((self.occupancy['w'] | self.occupancy['b']) ^ (1 << sq) ^ capturedBit) | (1 << epSq)
+        self.bitboards[enemyColor + 'P'] ^= capturedBit
+        isSafe = not self.isAttacked(self.bitboards[allyColor + 'K'].bit_length() - 1, enemyColor, occupied)
+        self.bitboards[enemyColor + 'P'] ^= capturedBit
+        return isSafe
+
+    def getRookMoves(self, sq, targets, moves):
+        self.addMoves(sq, rookAttacks(sq, self.occupancy['w'] | self.occupancy['b']) & targets, moves)
+
+    def getKnightMoves(self, sq, targets, moves):
+        if sq in self.pins: #a pinned knight can never move
+            return
+        self.addMoves(sq, KNIGHT_ATTACKS[sq] & targets, moves)
+
+    def getBishopMoves(self, sq, targets, moves):
+        self.addMoves(sq, bishopAttacks(sq, self.occupancy['w'] | self.occupancy['b']) & targets, moves)
+
+    def getQueenMoves(self, sq, targets, moves):
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        self.addMoves(sq, (rookAttacks(sq, occupied) | bishopAttacks(sq, occupied)) & targets, moves)
+
+    def getKingMoves(self, sq, targets, moves):
+        enemyColor = "b" if self.whiteMove else "w"
+        occupied = (self.occupancy['w'] | self.occupancy['b']) ^ (1 << sq) #the king cannot shield its own escape squares
+        for toSq in bitSquares(KING_ATTACKS[sq] & targets):
+            if not self.isAttacked(toSq, enemyColor, occupied):
+                moves.append(self.getMove(sq, toSq))
+
+    def getCastleMoves(self, sq, moves):
+        if self.checks:
             return #cannot castle while in check
-        if (self.whiteMove and self.currentCastlingRight.wKs) or (not self.whiteMove and self.currentCastlingRight.bKs):
+        r, c = SQUARES[sq]
+        kingSide, queenSide = (WHITE_KINGSIDE, WHITE_QUEENSIDE) if self.whiteMove else (BLACK_KINGSIDE, BLACK_QUEENSIDE)
+        if self.castlingRights & kingSide:
             self.getKingSideCastleMoves(r,c, moves)
-        if (self.whiteMove and self.currentCastlingRight.wQs) or (not self.whiteMove and self.currentCastlingRight.bQs):
+        if self.castlingRights & queenSide:
             self.getQueenSideCastleMoves(r,c, moves)
 
     def getKingSideCastleMoves(self, r, c, moves):
         if self.board[r][c + 1] == '--' and self.board[r][c + 2] == '--':
             if not self.sqUnderAttack(r, c + 1) and not self.sqUnderAttack(r, c + 2):
-                moves.append(Move((r, c), (r, c + 2), self.board, isCastleMove = True))
+                moves.append(self.getMove(r * 8 + c, r * 8 + c + 2, isCastleMove = True))
 
     def getQueenSideCastleMoves(self, r, c, moves):  
         if self.board[r][c - 1] == '--' and self.board[r][c - 2] == '--' and self.board[r][c - 3] == '--':
             if not self.sqUnderAttack(r, c - 1) and not self.sqUnderAttack(r, c - 2):
-                moves.append(Move((r, c), (r, c - 2), self.board, isCastleMove = True))  
-
-class CastleRights():
-    def __init__(self, wKs, bKs, wQs, bQs):
-        self.wKs = wKs
-        self.bKs = bKs
-        self.wQs = wQs
-        self.bQs = bQs
+                moves.append(self.getMove(r * 8 + c, r * 8 + c - 2, isCastleMove = True))
 
 class Move():
+    __slots__ = ('startRow', 'startCol', 'endRow', 'endCol', 'pieceMoved', 'pieceCaptured', 'moveID',
+                 'isPawnPromotion', 'promotionChoice', 'isCastleMove', 'isEnpassantMove')
+
     #maps keys to values
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rowsToRanks = {v: k for k, v in ranksToRows.items()}
@@ -313,7 +710,7 @@ class Move():
     filesToCols = {"A": 0, "B": 1, "C": 2, "D": 3, "E": 4, "F": 5, "G": 6, "H": 7}
     colsToFiles = {v: k for k, v in filesToCols.items()}
      
-    def __init__(self, startSq, endSq, board, isEnpassantMove = False, isCastleMove = False):
+    def __init__(self, startSq, endSq, board, isEnpassantMove = False, isCastleMove = False, promotionChoice = 'Q'):
         self.startRow = startSq[0]
         self.startCol = startSq[1]
         self.endRow = endSq[0]
@@ -322,6 +719,9 @@ class Move():
         self.pieceCaptured = board[self.endRow][self.endCol]    
         self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol 
         self.isPawnPromotion = (self.pieceMoved == 'wP' and self.endRow == 0) or (self.pieceMoved == 'bP' and self.endRow == 7)
+        self.promotionChoice = promotionChoice
+        if self.isPawnPromotion: #queen keeps the plain id so clicked moves match it
+            self.moveID += PROMOTION_PIECES.index(promotionChoice) * 10000
         self.isCastleMove = isCastleMove
         self.isEnpassantMove = isEnpassantMove
         if self.isEnpassantMove:
@@ -335,5 +735,10 @@ class Move():
     def getChessNotation(self):
         return self.getRankFile(self.startRow, self.startCol) + ", " + self.getRankFile(self.endRow, self.endCol)
     
+    #long algebraic notation such as e2e4 or e7e8q
+    def getUCINotation(self):
+        notation = (self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)).lower()
+        return notation + self.promotionChoice.lower() if self.isPawnPromotion else notation
+
     def getRankFile(self, r, c):
         return self.colsToFiles[c] + self.rowsToRanks[r]
\ No newline at end of file
@@ -0,0 +1,155 @@
+#Eval file: in charge of scoring batches of positions at once with NumPy
+#usage: python ChessEval.py --benchmark [--positions N] or python ChessEval.py --save-defaults weights.npz
+import argparse
+import random
+import time
+import numpy as np
+import ChessEngine
+
+#a position is 12 piece planes of 64 squares, one per color and piece, followed by the mobility terms
+PLANES = [color + piece for color in 'wb' for piece in 'PNBRQK']
+MOBILITY_PIECES = 'NBRQ'
+FEATURES = len(PLANES) * 64 + len(MOBILITY_PIECES)
+#centipawns per extra square a piece attacks, before any tuning
+MG_MOBILITY = {'N': 4, 'B': 5, 'R': 2, 'Q': 1}
+EG_MOBILITY = {'N': 4, 'B': 5, 'R': 4, 'Q': 2}
+
+#every square a knight attacks from each square, KNIGHT_MATRIX[s, t] is 1 when a knight on s attacks t
+KNIGHT_MATRIX = np.array([[(ChessEngine.KNIGHT_ATTACKS[s] >> t) & 1 for t in range(64)] for s in range(64)], dtype = np.float32)
+#squares along each of the 8 directions from each square, nearest first, padded with the off-board square 64
+RAY_DIRECTIONS = ChessEngine.ROOK_DIRECTIONS + ChessEngine.BISHOP_DIRECTIONS
+RAYS = np.full((64, len(RAY_DIRECTIONS), 8), 64, dtype = np.intp)
+for sq, (r, c) in enumerate(ChessEngine.SQUARES):
+    for d, (dr, dc) in enumerate(RAY_DIRECTIONS):
+        for i in range(1, 8):
+            if not (0 <= r + dr * i < 8 and 0 <= c + dc * i < 8):
+                break
+            RAYS[sq, d, i - 1] = (r + dr * i) * 8 + c + dc * i
+SLIDER_PLANES = [PLANES.index(color + piece) for color in 'wb' for piece in 'BRQ']
+SLIDER_DIRECTIONS = np.array([[piece != 'B'] * 4 + [piece != 'R'] * 4 for color in 'wb' for piece in 'BRQ'], dtype = np.intp) #rook directions come first
+SLIDER_COLUMNS = np.array([MOBILITY_PIECES.index(piece) for color in 'wb' for piece in 'BRQ'])
+
+#what the batch evaluator needs of a position: (12 bitboards in PLANES order, phase)
+#cheap enough to take while the search visits the position, so the positions themselves need not be kept
+def positionFeatures(gs):
+    bb = gs.bitboards
+    return tuple(bb[piece] for piece in PLANES), gs.phase
+
+#feature matrix (N, FEATURES) and phases (N,) of a list of positionFeatures
+def encodeBatch(positions):
+    boards = np.array([position[0] for position in positions], dtype = '<u8').reshape(len(positions), len(PLANES))
+    return encodeBoards(boards, np.array([position[1] for position in positions], dtype = np.float32))
+
+#the same from an (N, 12) array of bitboards and the phases
+#mobility of white minus black is worked out for the whole batch: knights by a matrix product, and for every
+#slider in the batch at once, the empty squares along its rays plus the first piece on each ray when that is an enemy
+def encodeBoards(boards, phases):
+    n = len(boards)
+    boards = np.ascontiguousarray(boards, dtype = '<u8')
+    planes = np.unpackbits(boards.view(np.uint8), axis = 1, bitorder = 'little').reshape(n, len(PLANES), 64) #bit sq of each plane
+    white = planes[:, :6].sum(axis = 1, dtype = np.uint8)
+    black = planes[:, 6:].sum(axis = 1, dtype = np.uint8)
+    features = np.zeros((n, FEATURES), dtype = np.float32)
+    features[:, :len(PLANES) * 64] = planes.reshape(n, -1)
+    mobilityColumn = len(PLANES) * 64
+    for color, own, sign in (('w', white, 1), ('b', black, -1)):
+        knights = planes[:, PLANES.index(color + 'N')].astype(np.float32)
+        features[:, mobilityColumn] += sign * ((knights @ KNIGHT_MATRIX) * (1 - own)).sum(axis = 1)
+    #every bishop, rook and queen of the batch in one pass, off the board counts as blocked and is never an enemy
+    batchIndex, slider, squares = np.nonzero(planes[:, SLIDER_PLANES])
+    if len(squares):
+        blocked = np.concatenate([white | black, np.ones((n, 1), dtype = np.uint8)], axis = 1)
+        enemies = np.stack([np.concatenate([side, np.zeros((n, 1), dtype = np.uint8)], axis = 1) for side in (black, white)])
+        rays = RAYS[squares] #(sliders, 8 directions, 8 squares)
+        empty = blocked[batchIndex[:, None, None], rays].argmax(axis = 2) #empty squares before the first piece
+        firstPiece = np.take_along_axis(rays, empty[..., None], axis = 2)[..., 0]
+        isBlack = slider >= len(SLIDER_PLANES) // 2
+        count = ((empty + enemies[isBlack.astype(np.intp)[:, None], batchIndex[:, None], firstPiece]) * SLIDER_DIRECTIONS[slider]).sum(axis = 1)
+        np.add.at(features, (batchIndex, mobilityColumn + SLIDER_COLUMNS[slider]), np.where(isBlack, -count, count))
+    return features, np.minimum(np.asarray(phases, dtype = np.float32), ChessEngine.TOTAL_PHASE)
+
+#linear tapered evaluation: one middlegame and one endgame weight per feature, white minus black in centipawns
+class Evaluator():
+    def __init__(self, path = None):
+        if path is None:
+            self.weights = defaultWeights()
+        else:
+            with np.load(path) as data:
+                self.weights = np.stack([data["mg"], data["eg"]], axis = 1).astype(np.float32)
+            if self.weights.shape != (FEATURES, 2):
+                raise ValueError("%s holds %d weights, expected %d" % (path, self.weights.shape[0], FEATURES))
+
+    def save(self, path):
+        np.savez(path, mg = self.weights[:, 0], eg = self.weights[:, 1])
+
+    #scores of an encoded batch, a single matrix product for both game phases
+    def evaluateEncoded(self, features, phases):
+        mg, eg = (features @ self.weights).T
+        return (mg * phases + eg * (ChessEngine.TOTAL_PHASE - phases)) / ChessEngine.TOTAL_PHASE
+
+    #integer scores of a list of positionFeatures
+    def evaluate(self, positions):
+        if not positions:
+            return []
+        return np.rint(self.evaluateEncoded(*encodeBatch(positions))).astype(int).tolist()
+
+    def scorePosition(self, gs):
+        return self.evaluate([positionFeatures(gs)])[0]
+
+    #the piece-square weights as GameState's tables, {piece: (middlegame scores, endgame scores)} in whole centipawns
+    def squareScores(self):
+        return {piece: (np.rint(self.weights[i * 64:(i + 1) * 64, 0]).astype(int).tolist(),
+                        np.rint(self.weights[i * 64:(i + 1) * 64, 1]).astype(int).tolist()) for i, piece in enumerate(PLANES)}
+
+    #GameState's incremental scores have no mobility term, only this evaluator uses it
+    def hasMobility(self):
+        return bool(self.weights[len(PLANES) * 64:].any())
+
+#the hand-set piece values and piece-square tables of ChessEngine, plus MG_MOBILITY and EG_MOBILITY
+def defaultWeights():
+    weights = np.zeros((FEATURES, 2), dtype = np.float32)
+    for i, piece in enumerate(PLANES):
+        weights[i * 64:(i + 1) * 64, 0] = ChessEngine.MG_SQUARE_SCORES[piece]
+        weights[i * 64:(i + 1) * 64, 1] = ChessEngine.EG_SQUARE_SCORES[piece]
+    for i, piece in enumerate(MOBILITY_PIECES):
+        weights[len(PLANES) * 64 + i] = MG_MOBILITY[piece], EG_MOBILITY[piece]
+    return weights
+
+#positions per second scored in batches against one at a time, over positions from random games
+def benchmark(count, batchSize):
+    rng = random.Random(0)
+    positions = []
+    while len(positions) < count:
+        gs = ChessEngine.GameState()
+        for ply in range(rng.randrange(10, 80)):
+            moves = gs.getValidMoves()
+            if not moves:
+                break
+            gs.makeMove(moves[rng.randrange(len(moves))])
+        positions.append(positionFeatures(gs))
+    evaluator = Evaluator()
+    startTime = time.time()
+    for position in positions:
+        evaluator.evaluate([position])
+    single = time.time() - startTime
+    startTime = time.time()
+    for i in range(0, count, batchSize):
+        evaluator.evaluate(positions[i:i + batchSize])
+    batched = time.time() - startTime
+    print("one at a time %8.0f positions/s" % (count / single))
+    print("batches of %-3d %8.0f positions/s" % (batchSize, count / batched))
+
+def main():
+    parser = argparse.ArgumentParser(description = "NumPy batch evaluation")
+    parser.add_argument("--benchmark", action = "store_true", help = "time batched against single evaluation")
+    parser.add_argument("--positions", type = int, default = 2000)
+    parser.add_argument("--batch", type = int, default = 32)
+    parser.add_argument("--save-defaults", metavar = "PATH", help = "write the untuned weights to an .npz file")
+    args = parser.parse_args()
+    if args.save_defaults:
+        Evaluator().save(args.save_defaults)
+    if args.benchmark:
+        benchmark(args.positions, args.batch)
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,94 @@
 #Driver file: in charge of user input and current game state
-
+#usage: python ChessMain.py, or python ChessMain.py --measure 600 [--full-redraw] to time startup and frames
+import time
+START_TIME = time.perf_counter() #cold start is measured from here
+import argparse
+import copy
+import queue
+import threading
 import pygame as p
 import ChessEngine, ChessAI
 
-p.init()
 WIDTH = HEIGHT = 600
 DIMENSION = 8 # Chess boards are 8x8
 SQ_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 60
-IMAGES = {}
-move_sound = p.mixer.Sound("sounds/move.wav")
+COLORS = [p.Color("#eeeed2"), p.Color("#769656")] #light, dark
+IMAGES = {} #scaled piece images, loaded once by loadImages
+FONTS = {} #(name, size, bold) -> font, SysFont searches the system fonts on every call
+moveSound = None #loaded on the first move, False when there is no audio device
+#what a square shows besides its piece
+NO_HIGHLIGHT = 0
+SELECTED = 1 #the piece the player picked
+TARGET = 2 #a square the picked piece can move to
 
-# For loading images
+# For loading images, the window has to be open so they can be converted to its pixel format
 def loadImages():
+    if IMAGES:
+        return
     pieces = ["wP", "wR", "wN", "wB", "wK", "wQ", "bP", "bR", "bN", "bB", "bK", "bQ"]
     for piece in pieces:
         chessPieces = p.image.load("images/" + piece + ".png")
-        IMAGES[piece] = p.transform.smoothscale(chessPieces, (SQ_SIZE - 10, SQ_SIZE - 10))
-    
+        IMAGES[piece] = p.transform.smoothscale(chessPieces, (SQ_SIZE - 10, SQ_SIZE - 10)).convert_alpha()
+
+def getFont(name, size, bold = False):
+    if (name, size, bold) not in FONTS:
+        FONTS[(name, size, bold)] = p.font.SysFont(name, size, bold = bold)
+    return FONTS[(name, size, bold)]
+
+# the mixer is only started when the first move is played, opening the audio device is slow
+def playMoveSound():
+    global moveSound
+    if moveSound is None:
+        try:
+            p.mixer.init()
+            moveSound = p.mixer.Sound("sounds/move.wav")
+        except p.error:
+            moveSound = False
+    if moveSound:
+        moveSound.play()
+
 # Main driver that will handle user input and update graphics
-def main():
+def main(measureFrames = None, fullRedraw = False):
+    p.display.init()
+    p.font.init()
     screen = p.display.set_mode((WIDTH, HEIGHT))
     p.display.set_caption('SP-14-RED | Chess AI')
     clock = p.time.Clock()
+    ChessAI.TUNED_WEIGHTS = True #weights.npz from ChessTuner when there is one
+    ChessAI.applyTunedWeights() #before the first position is set up, which scores with them
     gs = ChessEngine.GameState()
     validMoves = gs.getValidMoves()
+    drawReason = None #set when the game is drawn by repetition, the fifty-move rule or insufficient material
     moveMade = False
     animate = False
     loadImages()
+    renderer = BoardRenderer(screen)
     running = True
     sqSelected = () #none selected initially
     playerClicks = [] #tracks player clicks
     gameOver = False
     playerOne = True # Determines if white is player(T) or AI(F)
     playerTwo = False # Deterermines if black is player(T) or AI(F)
+    aiThinking = False #an AI search is running on the worker thread
+    aiWorker = None
+    aiStop = None #event that cancels the running search
+    returnQueue = queue.Queue()
+    frameCount = 0
+    frameTime = 0.0 #processor time spent on frames after the first
 
     while running:
+        frameStart = time.process_time()
         humanTurn = (gs.whiteMove and playerOne) or (not gs.whiteMove and playerTwo)
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
-            #mouse 
+                if aiThinking:
+                    stopAI(aiWorker, aiStop)
+                    aiThinking = False
+            elif e.type == p.VIDEOEXPOSE: #the window was covered, its contents are gone
+                renderer.invalidate()
+            #mouse
             elif e.type == p.MOUSEBUTTONDOWN: #click functions
                 if not gameOver and humanTurn:
                     location = p.mouse.get_pos() #takes x and y position of the mouse
@@ -52,21 +100,25 @@ def main():
                         sqSelected = (row, col) #select click
                         playerClicks.append(sqSelected)
                     if len(playerClicks) == 2: #action on second click
-                        move = ChessEngine.Move(playerClicks[0], playerClicks[1], gs.board)
+                        move = ChessEngine.Move(playerClicks[0], playerClicks[1], gs.board) #promotions made by clicking are queened
                         print(move.getChessNotation())
                         for i in range(len(validMoves)):
                             if move == validMoves[i]:
-                                p.mixer.Sound.play(move_sound)
+                                playMoveSound()
                                 gs.makeMove(validMoves[i])
                                 moveMade = True
-                                animate = True 
+                                animate = True
                                 sqSelected = ()
                                 playerClicks = []
+                                break
                         if not moveMade:
                             playerClicks = [sqSelected]
             #key presses
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z: #undo when z key is pressed
+                    if aiThinking:
+                        stopAI(aiWorker, aiStop)
+                        aiThinking = False
                     gameOver = False
                     gs.checkmate = False
                     gs.stalemate = False
@@ -82,12 +134,19 @@ def main():
                         playerTwo = False
                     else:
                         gs.undoMove()
-                    moveMade = True 
+                    validMoves = gs.getValidMoves()
+                    drawReason = gs.getDrawReason()
+                    moveMade = True
                     animate = False
                 elif e.key == p.K_r: #reset board when r is pressed
+                    if aiThinking:
+                        stopAI(aiWorker, aiStop)
+                        aiThinking = False
                     gameOver = False
                     gs = ChessEngine.GameState()
                     validMoves = gs.getValidMoves()
+                    drawReason = None
+                    ChessAI.transpositionTable.clear()
                     sqSelected = ()
                     playerClicks = []
                     moveMade = False
@@ -103,127 +162,226 @@ def main():
                         playerTwo = False
                     else:
                         playerTwo = True
-        #AI Move
-        if not gameOver and not humanTurn:
-            AI_Move = ChessAI.findBestMove(gs, validMoves)
-            if AI_Move is None:
-                AI_Move = ChessAI.findRandomMove(validMoves)
-            p.mixer.Sound.play(move_sound)
-            gs.makeMove(AI_Move)
-            moveMade = True
-            animate = True
+        #AI Move, searched on a worker thread with its own copy of the game so the window keeps drawing
+        humanTurn = (gs.whiteMove and playerOne) or (not gs.whiteMove and playerTwo) #the events may have moved, undone or switched sides
+        if aiThinking and humanTurn: #side was switched to a player mid-think
+            stopAI(aiWorker, aiStop)
+            aiThinking = False
+        if running and not gameOver and not humanTurn:
+            if not aiThinking and not moveMade: #a move made or undone this frame is finished first, so validMoves is current
+                aiThinking = True
+                aiStop = threading.Event()
+                returnQueue = queue.Queue()
+                aiWorker = threading.Thread(target = findAIMove, args = (copy.deepcopy(gs), list(validMoves), returnQueue, aiStop), daemon = True)
+                aiWorker.start()
+            elif not returnQueue.empty():
+                AI_Move = returnQueue.get()
+                aiThinking = False
+                info = ChessAI.searchInfo
+                if info:
+                    print("depth", info['depth'], "nodes", info['nodes'], "nps", info['nps'])
+                playMoveSound()
+                gs.makeMove(AI_Move)
+                moveMade = True
+                animate = True
         if moveMade:
             if animate:
                 if len(gs.moveLog) != 0:
-                    animateMove(gs.moveLog[-1], screen, gs.board, clock)
+                    renderer.animateMove(gs.moveLog[-1], gs.board, clock)
             validMoves = gs.getValidMoves()
+            drawReason = gs.getDrawReason()
             moveMade = False
             animate = False
 
-        drawGameState(screen, gs, validMoves, sqSelected)
+        overlays = [] #drawn over the board: ('thinking', depth, nodes) or ('text', message)
         if gs.checkmate:
             gameOver = True
             if gs.whiteMove:
-                drawText(screen, 'Black wins by checkmate')
+                overlays.append(('text', 'Black wins by checkmate'))
             else:
-                drawText(screen, 'White wins by checkmate')
+                overlays.append(('text', 'White wins by checkmate'))
         elif gs.stalemate:
             gameOver = True
-            drawText(screen, 'Stalemate, Game is over')
+            overlays.append(('text', 'Stalemate, Game is over'))
+        elif drawReason is not None:
+            gameOver = True
+            overlays.append(('text', 'Draw by ' + drawReason))
+        if aiThinking:
+            overlays.append(('thinking', ChessAI.searchDepth, ChessAI.nodes))
+        if fullRedraw:
+            renderer.invalidate()
+        renderer.render(gs, validMoves, sqSelected, overlays)
 
+        if frameCount == 0 and measureFrames is not None:
+            print("cold start %.0f ms" % ((time.perf_counter() - START_TIME) * 1000))
+        elif frameCount > 0:
+            frameTime += time.process_time() - frameStart
+        frameCount += 1
+        if measureFrames is not None and frameCount > measureFrames:
+            print("%.2f ms processor time per frame over %d frames" % (frameTime * 1000 / measureFrames, measureFrames))
+            running = False
         clock.tick(MAX_FPS)
-        p.display.flip()
-
-# Responsable for all the graphics 
-def drawGameState(screen, gs, validMoves, sqSelected):
-    drawBoard(screen) # Draw squares on the board
-    highlightSquares(screen, gs, validMoves, sqSelected)
-    drawPieces(screen, gs.board) # Draw pieces on the board
-    drawSquareLabels(screen)
-
-# highglights valid moves
-def highlightSquares(screen, gs, validMoves, sqSelected):
-    if sqSelected != ():
-        r, c = sqSelected
-        if gs.board[r][c][0] == ('w' if gs.whiteMove else 'b'):
-            s = p.Surface((SQ_SIZE, SQ_SIZE))
-            s.fill(p.Color('#6495ED'))
-            screen.blit(s, (c * SQ_SIZE, r * SQ_SIZE))
-            s.set_alpha(150)
-            s.fill(p.Color('yellow'))
-            for move in validMoves:
-                if move.startRow == r and move.startCol == c:
-                    screen.blit(s, (SQ_SIZE * move.endCol, SQ_SIZE * move.endRow))
+
+# runs on the worker thread and hands the chosen move back through the queue
+def findAIMove(gs, validMoves, returnQueue, stopEvent):
+    AI_Move = ChessAI.findBestMove(gs, validMoves, timeLimit = ChessAI.TIME_LIMIT, cancelEvent = stopEvent)
+    if AI_Move is None:
+        AI_Move = ChessAI.findRandomMove(validMoves)
+    returnQueue.put(AI_Move)
+
+# cancels the search and waits for the worker, which stops within a few hundred nodes
+def stopAI(aiWorker, stopEvent):
+    stopEvent.set()
+    aiWorker.join()
 
 @staticmethod
 def get_alphacol(col):
     ALPHACOLS = {0: 'a', 1: 'b', 2: 'c', 3: 'd', 4: 'e', 5: 'f', 6: 'g', 7: 'h'}
     return ALPHACOLS[col]
 
-# Draw squares on the board
-def drawBoard(screen):
-    global colors
-    colors = [p.Color("#eeeed2"), p.Color("#769656")] #light, dark
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
-            color = colors[((r + c) % 2)]
-            p.draw.rect(screen, color, p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+def squareRect(sq):
+    return p.Rect(sq % DIMENSION * SQ_SIZE, sq // DIMENSION * SQ_SIZE, SQ_SIZE, SQ_SIZE)
 
-def drawSquareLabels(screen):
-    font = p.font.SysFont('monospace', 18, bold = True)
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
+# Responsable for all the graphics
+# remembers what every square of the window shows and each frame redraws only the squares that changed,
+# from an empty board and a square label layer rendered once
+class BoardRenderer():
+    def __init__(self, screen):
+        self.screen = screen
+        self.boardSurface = p.Surface((WIDTH, HEIGHT)).convert()
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                p.draw.rect(self.boardSurface, COLORS[(r + c) % 2], p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+        self.labelSurface = p.Surface((WIDTH, HEIGHT), p.SRCALPHA).convert_alpha()
+        font = getFont('monospace', 18, bold = True)
+        for r in range(DIMENSION):
             #row position text
-            if c == 0:
-                color = "#769656" if r % 2 == 0 else "#eeeed2"
-                label = font.render(str(DIMENSION - r), 1, color)
-                label_pos = (5, 5 + r * SQ_SIZE)
-                screen.blit(label, label_pos)
-            #columns position text
-            if r == 7:
-                color = "#769656" if (r + c) % 2 == 0 else "#eeeed2"
-                label = font.render(get_alphacol(c), 1, color)
-                label_pos = (c * SQ_SIZE + SQ_SIZE - 20, HEIGHT - 20)
-                screen.blit(label, label_pos)
-
-# Draw pieces on the board
-def drawPieces(screen, board):
-    for r in range(DIMENSION):
+            label = font.render(str(DIMENSION - r), 1, COLORS[1] if r % 2 == 0 else COLORS[0])
+            self.labelSurface.blit(label, (5, 5 + r * SQ_SIZE))
         for c in range(DIMENSION):
-            piece = board[r][c]
-            if piece != "--": # If empty square
-                screen.blit(IMAGES[piece], p.Rect(c*SQ_SIZE + 4, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
-
-# piece animation movement
-def animateMove(move, screen, board, clock):
-    global colors
-    dR = move.endRow - move.startRow
-    dC = move.endCol - move.startCol
-    framesPerSquare = 10
-    frameCount = (abs(dR) + abs(dC)) * framesPerSquare
-    for frame in range(frameCount + 1):
-        r, c = ((move.startRow + dR * frame/frameCount, move.startCol + dC * frame/frameCount))
-        drawBoard(screen)
-        drawPieces(screen, board)
-        drawSquareLabels(screen)
-        color = colors[(move.endRow + move.endCol) % 2]
-        endSquare = p.Rect(move.endCol * SQ_SIZE, move.endRow * SQ_SIZE, SQ_SIZE, SQ_SIZE)
-        p.draw.rect(screen, color, endSquare)
-        # piece capture animate
-        if move.pieceCaptured != '--':
-            screen.blit(IMAGES[move.pieceCaptured], endSquare)
-        #draw movement
-        screen.blit(IMAGES[move.pieceMoved], p.Rect(c * SQ_SIZE + 4, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
-        p.display.flip()
-        clock.tick(60)
-
-def drawText(screen, text):
-    font = p.font.SysFont("Calibri", 48, True, False)
+            #columns position text
+            label = font.render(get_alphacol(c), 1, COLORS[1] if (7 + c) % 2 == 0 else COLORS[0])
+            self.labelSurface.blit(label, (c * SQ_SIZE + SQ_SIZE - 20, HEIGHT - 20))
+        self.selectedSurface = p.Surface((SQ_SIZE, SQ_SIZE)).convert()
+        self.selectedSurface.fill(p.Color('#6495ED'))
+        self.targetSurface = p.Surface((SQ_SIZE, SQ_SIZE)).convert()
+        self.targetSurface.set_alpha(150)
+        self.targetSurface.fill(p.Color('yellow'))
+        self.squares = [None] * 64 #(piece, highlight) each square shows in the window, None when unknown
+        self.overlays = [] #(key, [(surface, position)...], rect) drawn over the board in the window
+
+    # forgets the window contents, the next frame redraws all of it
+    def invalidate(self):
+        self.squares = [None] * 64
+        self.overlays = []
+
+    def render(self, gs, validMoves, sqSelected, overlayKeys):
+        p.display.update(self.showSquares(self.squareStates(gs, validMoves, sqSelected), overlayKeys))
+
+    # highglights valid moves
+    def squareStates(self, gs, validMoves, sqSelected):
+        squares = [(gs.board[r][c], NO_HIGHLIGHT) for r, c in ChessEngine.SQUARES]
+        if sqSelected != ():
+            r, c = sqSelected
+            if gs.board[r][c][0] == ('w' if gs.whiteMove else 'b'):
+                squares[r * DIMENSION + c] = (gs.board[r][c], SELECTED)
+                for move in validMoves:
+                    if move.startRow == r and move.startCol == c:
+                        sq = move.endRow * DIMENSION + move.endCol
+                        squares[sq] = (squares[sq][0], TARGET)
+        return squares
+
+    # draws the squares that differ from the window and the overlays, returns the rectangles that changed
+    # an overlay is see-through, so it is only drawn again over squares that were all redrawn beneath it
+    def showSquares(self, squares, overlayKeys):
+        dirty = {sq for sq in range(64) if squares[sq] != self.squares[sq]}
+        overlays = [self.findOverlay(key) for key in overlayKeys]
+        overlayRects = [rect for key, parts, rect in overlays]
+        redrawOverlays = overlayKeys != [key for key, parts, rect in self.overlays] or any(squareRect(sq).collidelist(overlayRects) != -1 for sq in dirty)
+        if redrawOverlays:
+            covered = overlayRects + [rect for key, parts, rect in self.overlays]
+            dirty.update(sq for sq in range(64) if squareRect(sq).collidelist(covered) != -1)
+        self.squares = squares
+        for sq in dirty:
+            self.drawSquare(sq)
+        if redrawOverlays:
+            for key, parts, rect in overlays:
+                for surface, position in parts:
+                    self.screen.blit(surface, position)
+        self.overlays = overlays
+        return [squareRect(sq) for sq in dirty]
+
+    # the square's color, highlight, piece and label
+    def drawSquare(self, sq):
+        piece, highlight = self.squares[sq]
+        rect = squareRect(sq)
+        self.screen.blit(self.boardSurface, rect, rect)
+        if highlight == SELECTED:
+            self.screen.blit(self.selectedSurface, rect)
+        elif highlight == TARGET:
+            self.screen.blit(self.targetSurface, rect)
+        if piece != "--": # If empty square
+            self.screen.blit(IMAGES[piece], (rect.x + 4, rect.y))
+        self.screen.blit(self.labelSurface, rect, rect)
+
+    # the drawing of an overlay is kept while its key stays the same
+    def findOverlay(self, key):
+        for overlay in self.overlays:
+            if overlay[0] == key:
+                return overlay
+        if key[0] == 'thinking':
+            parts = renderThinking(key[1], key[2])
+        else:
+            parts = renderText(key[1])
+        rect = parts[0][0].get_rect(topleft = parts[0][1]).unionall([surface.get_rect(topleft = position) for surface, position in parts[1:]])
+        return key, parts, rect
+
+    # piece animation movement, only the squares under the moving piece are drawn again each frame
+    def animateMove(self, move, board, clock):
+        squares = [(board[r][c], NO_HIGHLIGHT) for r, c in ChessEngine.SQUARES]
+        endSq = move.endRow * DIMENSION + move.endCol
+        squares[endSq] = (move.pieceCaptured, NO_HIGHLIGHT) # piece capture animate
+        p.display.update(self.showSquares(squares, []))
+        dR = move.endRow - move.startRow
+        dC = move.endCol - move.startCol
+        framesPerSquare = 10
+        frameCount = (abs(dR) + abs(dC)) * framesPerSquare
+        image = IMAGES[move.pieceMoved]
+        lastRect = None
+        for frame in range(frameCount + 1):
+            r, c = ((move.startRow + dR * frame/frameCount, move.startCol + dC * frame/frameCount))
+            pieceRect = image.get_rect(topleft = (c * SQ_SIZE + 4, r * SQ_SIZE))
+            area = pieceRect if lastRect is None else pieceRect.union(lastRect)
+            for sq in range(64):
+                if squareRect(sq).colliderect(area):
+                    self.drawSquare(sq)
+            #draw movement
+            self.screen.blit(image, pieceRect)
+            p.display.update(area)
+            lastRect = pieceRect
+            clock.tick(60)
+        for sq in range(64): #the piece is drawn over the squares it ended on
+            if squareRect(sq).colliderect(lastRect):
+                self.squares[sq] = None
+
+# search progress in the top right corner while the AI is thinking
+def renderThinking(depth, nodeCount):
+    font = getFont('monospace', 16, bold = True)
+    text = font.render("Thinking... depth " + str(depth) + " nodes " + str(nodeCount), 1, p.Color('Black'))
+    background = p.Surface((text.get_width() + 10, text.get_height() + 6))
+    background.set_alpha(180)
+    background.fill(p.Color('white'))
+    return [(background, (WIDTH - background.get_width(), 0)), (text, (WIDTH - background.get_width() + 5, 3))]
+
+def renderText(text):
+    font = getFont("Calibri", 48, bold = True)
     textObject = font.render(text, 1, p.Color('Gray'))
     textLocation = p.Rect(0, 0, WIDTH, HEIGHT).move(WIDTH / 2 - textObject.get_width() / 2, HEIGHT / 2 - textObject.get_height() / 2)
-    screen.blit(textObject, textLocation)
-    textObject = font.render(text, 1, p.Color('Black'))
-    screen.blit(textObject, textLocation.move(2, 2))
+    return [(textObject, textLocation.topleft), (font.render(text, 1, p.Color('Black')), textLocation.move(2, 2).topleft)]
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description = "Play chess against the AI")
+    parser.add_argument("--measure", type = int, metavar = "FRAMES", help = "print the cold start time and the processor time per frame, then quit")
+    parser.add_argument("--full-redraw", action = "store_true", help = "draw the whole board every frame, to compare with")
+    args = parser.parse_args()
+    main(args.measure, args.full_redraw)
@@ -0,0 +1,145 @@
+#PGN file: in charge of reading and writing games in standard algebraic notation
+import ChessEngine
+
+#standard algebraic notation of a move in the current position, validMoves are the moves of that position
+def getSAN(gs, move, validMoves):
+    if move.isCastleMove:
+        san = "O-O" if move.endCol > move.startCol else "O-O-O"
+    else:
+        target = move.getRankFile(move.endRow, move.endCol).lower()
+        piece = move.pieceMoved[1]
+        capture = move.pieceCaptured != "--"
+        if piece == 'P':
+            san = (move.colsToFiles[move.startCol].lower() + "x" if capture else "") + target
+            if move.isPawnPromotion:
+                san += "=" + move.promotionChoice
+        else:
+            #other pieces of the same type that can reach the same square
+            others = [other for other in validMoves if other.pieceMoved == move.pieceMoved and other.endRow == move.endRow and
+                      other.endCol == move.endCol and (other.startRow, other.startCol) != (move.startRow, move.startCol)]
+            disambiguation = ""
+            if others:
+                if all(other.startCol != move.startCol for other in others):
+                    disambiguation = move.colsToFiles[move.startCol].lower()
+                elif all(other.startRow != move.startRow for other in others):
+                    disambiguation = move.rowsToRanks[move.startRow]
+                else:
+                    disambiguation = move.getRankFile(move.startRow, move.startCol).lower()
+            san = piece + disambiguation + ("x" if capture else "") + target
+    gs.makeMove(move)
+    if gs.inCheck():
+        san += "#" if len(gs.getValidMoves()) == 0 else "+"
+    gs.undoMove()
+    return san
+
+#SAN of every move in the game's move log, replayed from the starting FEN
+def getGameSAN(moveLog, fen = ChessEngine.START_FEN):
+    gs = ChessEngine.GameState()
+    gs.loadFEN(fen)
+    sanMoves = []
+    for move in moveLog:
+        sanMoves.append(getSAN(gs, move, gs.getValidMoves()))
+        gs.makeMove(move)
+    return sanMoves
+
+#PGN text of a game from its tags and SAN moves, the seven tag roster comes first
+def gameToPGN(tags, sanMoves, result, whiteMovesFirst = True, firstMoveNumber = 1):
+    roster = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
+    tags = dict(tags, Result = result)
+    lines = ['[%s "%s"]' % (name, tags.get(name, "?")) for name in roster]
+    lines += ['[%s "%s"]' % (name, value) for name, value in tags.items() if name not in roster]
+    tokens = []
+    moveNumber = firstMoveNumber
+    whiteToMove = whiteMovesFirst
+    for i, san in enumerate(sanMoves): #move numbers stay on the same line as their move
+        if whiteToMove:
+            tokens.append(str(moveNumber) + ". " + san)
+        elif i == 0:
+            tokens.append(str(moveNumber) + "... " + san)
+        else:
+            tokens.append(san)
+        if not whiteToMove:
+            moveNumber += 1
+        whiteToMove = not whiteToMove
+    tokens.append(result)
+    #movetext lines are kept under 80 characters
+    movetext = []
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            movetext.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n"
+
+#the legal move a SAN string names, None if no move matches
+def parseSAN(gs, san, validMoves):
+    san = san.rstrip("+#!?")
+    if san.startswith("O-O") or san.startswith("0-0"):
+        kingSide = san.replace("0", "O") == "O-O"
+        for move in validMoves:
+            if move.isCastleMove and (move.endCol > move.startCol) == kingSide:
+                return move
+        return None
+    promotionChoice = 'Q'
+    if "=" in san:
+        san, promotionChoice = san.split("=")
+        promotionChoice = promotionChoice[:1].upper()
+    elif san[-1:] in "QRBN" and len(san) > 2 and san[0].islower(): #promotion written without "="
+        san, promotionChoice = san[:-1], san[-1]
+    piece = san[0] if san[0] in "KQRBN" else 'P'
+    if piece != 'P':
+        san = san[1:]
+    if len(san) < 2 or san[-2].upper() not in ChessEngine.Move.filesToCols or san[-1] not in ChessEngine.Move.ranksToRows:
+        return None
+    endRow = ChessEngine.Move.ranksToRows[san[-1]]
+    endCol = ChessEngine.Move.filesToCols[san[-2].upper()]
+    disambiguation = san[:-2].replace("x", "")
+    for move in validMoves:
+        if move.pieceMoved[1] != piece or move.endRow != endRow or move.endCol != endCol:
+            continue
+        if move.isPawnPromotion and move.promotionChoice != promotionChoice:
+            continue
+        if any((ch.isdigit() and ChessEngine.Move.ranksToRows[ch] != move.startRow) or
+               (ch.isalpha() and ChessEngine.Move.filesToCols[ch.upper()] != move.startCol) for ch in disambiguation):
+            continue
+        return move
+    return None
+
+#yields (tags, SAN moves, result) for every game in a PGN file, comments, variations and annotations are skipped
+def readGames(path):
+    tags = {}
+    movetext = []
+    with open(path, encoding = "utf-8", errors = "replace") as pgnFile:
+        for line in pgnFile:
+            line = line.strip()
+            if line.startswith("["):
+                if movetext:
+                    yield parseGame(tags, " ".join(movetext))
+                    tags = {}
+                    movetext = []
+                name, _, value = line[1:-1].partition(" ")
+                tags[name] = value.strip('"')
+            elif line and not line.startswith("%"):
+                movetext.append(line)
+    if movetext:
+        yield parseGame(tags, " ".join(movetext))
+
+def parseGame(tags, movetext):
+    tokens = []
+    depth = 0 #nesting of comments and variations
+    for token in movetext.replace("{", " { ").replace("}", " } ").replace("(", " ( ").replace(")", " ) ").split():
+        if token in ("{", "("):
+            depth += 1
+        elif token in ("}", ")"):
+            depth -= 1
+        elif depth == 0 and not token.startswith("$"):
+            token = token.split(".")[-1] #drops move numbers such as 12. or 12...
+            if token:
+                tokens.append(token)
+    result = tags.get("Result", "*")
+    if tokens and tokens[-1] in ("1-0", "0-1", "1/2-1/2", "*"):
+        result = tokens.pop()
+    return tags, tokens, result
@@ -0,0 +1,118 @@
+#Perft file: in charge of counting move generation nodes to check ChessEngine against known results
+#usage: python ChessPerft.py [--fen FEN] [--depth N] [--divide] or python ChessPerft.py --suite [--max-nodes N]
+import argparse
+import time
+import ChessEngine
+
+#published perft results as (name, fen, {depth: nodes})
+PERFT_SUITE = [
+    ("start position", ChessEngine.START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position 4 mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    ("illegal en passant 1", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", {6: 1134888}),
+    ("illegal en passant 2", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", {6: 1015133}),
+    ("en passant gives check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", {6: 1440467}),
+    ("short castle gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", {6: 661072}),
+    ("long castle gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", {6: 803711}),
+    ("castling rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", {4: 1274206}),
+    ("castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", {4: 1720476}),
+    ("promote out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", {6: 3821001}),
+    ("discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", {5: 1004658}),
+    ("promote to give check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1", {6: 217342}),
+    ("underpromote to give check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1", {6: 92683}),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", {6: 2217}),
+    ("stalemate and checkmate 1", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1", {7: 567584}),
+    ("stalemate and checkmate 2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", {4: 23527}),
+]
+
+#number of leaf nodes at the given depth, the last ply is counted without making the moves
+def perft(gs, depth):
+    moves = gs.getValidMoves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+#perft split by root move, as {move notation: nodes}
+def divide(gs, depth):
+    counts = {}
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        counts[move.getUCINotation()] = perft(gs, depth - 1)
+        gs.undoMove()
+    return counts
+
+def loadPosition(fen):
+    gs = ChessEngine.GameState()
+    gs.loadFEN(fen)
+    return gs
+
+#runs every suite entry whose expected node count fits in maxNodes, returns True if all of them matched
+def runSuite(maxNodes):
+    passed = failed = skipped = 0
+    totalNodes = 0
+    startTime = time.time()
+    for name, fen, results in PERFT_SUITE:
+        for depth in sorted(results):
+            expected = results[depth]
+            if expected > maxNodes:
+                skipped += 1
+                continue
+            gs = loadPosition(fen)
+            t = time.time()
+            nodes = perft(gs, depth)
+            elapsed = time.time() - t
+            totalNodes += nodes
+            status = "ok" if nodes == expected else "FAIL (expected " + str(expected) + ")"
+            print(name, "depth", depth, "nodes", nodes, "time %.2fs" % elapsed, status)
+            if nodes == expected:
+                passed += 1
+            else:
+                failed += 1
+    elapsed = time.time() - startTime
+    print("passed", passed, "failed", failed, "skipped", skipped)
+    print("total nodes", totalNodes, "time %.2fs" % elapsed, "nps", int(totalNodes / elapsed) if elapsed > 0 else 0)
+    return failed == 0
+
+def main():
+    parser = argparse.ArgumentParser(description = "Perft node counts for ChessEngine")
+    parser.add_argument("--fen", default = ChessEngine.START_FEN)
+    parser.add_argument("--depth", type = int, default = 4)
+    parser.add_argument("--divide", action = "store_true", help = "show the node count of every root move")
+    parser.add_argument("--suite", action = "store_true", help = "check the published perft results")
+    parser.add_argument("--max-nodes", type = int, default = 1000000, help = "skip suite entries larger than this")
+    args = parser.parse_args()
+
+    if args.suite:
+        raise SystemExit(0 if runSuite(args.max_nodes) else 1)
+
+    gs = loadPosition(args.fen)
+    startTime = time.time()
+    if args.divide:
+        counts = divide(gs, args.depth)
+        for notation in sorted(counts):
+            print(notation + ":", counts[notation])
+        nodes = sum(counts.values())
+        print("moves", len(counts))
+    else:
+        nodes = perft(gs, args.depth)
+    elapsed = time.time() - startTime
+    print("nodes", nodes, "time %.2fs" % elapsed, "nps", int(nodes / elapsed) if elapsed > 0 else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#Self-play file: in charge of headless matches between two AI configurations
+#usage: python ChessSelfPlay.py --games 100 --engine-a depth=3 --engine-b depth=3 time=0.5 MOVE_ORDERING=False --pgn games.pgn
+#       python ChessSelfPlay.py --games 100 --engine-a TUNED_WEIGHTS=True --engine-b TUNED_WEIGHTS=False
+import argparse
+import ast
+import concurrent.futures
+import math
+import os
+import random
+import time
+import ChessEngine, ChessAI, ChessPGN
+
+MAX_PLIES = 600 #games still running after this many plies are scored as draws
+#ChessAI settings as imported, before any game changed them. every move restores the settings neither config sets
+#from here, since a pool worker keeps the ChessAI module between games
+DEFAULT_SETTINGS = {key: value for key, value in vars(ChessAI).items() if key.isupper()}
+
+#parses KEY=VALUE items: depth, time and nodes set the search budget, upper case keys override ChessAI settings
+def parseEngineConfig(items):
+    config = {}
+    for item in items:
+        key, value = item.split("=", 1)
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+        if key not in ("depth", "time", "nodes") and not hasattr(ChessAI, key):
+            raise ValueError("unknown engine option: " + key)
+        config[key] = value
+    return config
+
+def configName(name, config):
+    return name + " (" + " ".join(key + "=" + str(value) for key, value in config.items()) + ")" if config else name
+
+#a random opening shared by both games of a pair so neither side gets the easier position
+def randomOpening(rng, plies):
+    gs = ChessEngine.GameState()
+    opening = []
+    for ply in range(plies):
+        validMoves = gs.getValidMoves()
+        if len(validMoves) == 0:
+            break
+        move = validMoves[rng.randrange(len(validMoves))]
+        opening.append(move.getUCINotation())
+        gs.makeMove(move)
+    return opening
+
+#runs in a worker: plays one game and returns (game index, result from engine A's side, PGN text)
+def playGame(gameIndex, configA, configB, opening, aIsWhite, seed):
+    random.seed(seed)
+    defaults = {key: DEFAULT_SETTINGS[key] for config in (configA, configB) for key in config if key.isupper()}
+    defaults.update(DEPTH = DEFAULT_SETTINGS["DEPTH"], MAX_DEPTH = DEFAULT_SETTINGS["MAX_DEPTH"])
+    tables = {'A': ChessAI.TranspositionTable(), 'B': ChessAI.TranspositionTable()} #each side keeps its own
+    gs = ChessEngine.GameState()
+    for notation in opening:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getUCINotation() == notation))
+    termination = "normal"
+    while True:
+        validMoves = gs.getValidMoves()
+        if gs.checkmate:
+            result = "0-1" if gs.whiteMove else "1-0"
+            break
+        if gs.stalemate:
+            result = "1/2-1/2"
+            break
+        drawReason = gs.getDrawReason()
+        if drawReason is not None:
+            result = "1/2-1/2"
+            termination = drawReason
+            break
+        if len(gs.moveLog) >= MAX_PLIES:
+            result = "1/2-1/2"
+            termination = "adjudication"
+            break
+        side = 'A' if gs.whiteMove == aIsWhite else 'B'
+        config = configA if side == 'A' else configB
+        for key, value in defaults.items():
+            setattr(ChessAI, key, config.get(key, value))
+        if "depth" in config:
+            ChessAI.DEPTH = ChessAI.MAX_DEPTH = config["depth"]
+        ChessAI.transpositionTable = tables[side]
+        if ChessAI.applyTunedWeights(): #a TUNED_WEIGHTS setting of one side changes the scores of the position
+            gs.loadBitboards()
+        move = ChessAI.findBestMove(gs, list(validMoves), timeLimit = config.get("time"), nodeLimit = config.get("nodes"))
+        if move is None:
+            move = ChessAI.findRandomMove(validMoves)
+        gs.makeMove(move)
+    ChessAI.shutdownProcessPool() #search processes of a THREADS setting would keep this worker from exiting
+    tags = {"Event": "ChessAI self-play", "Site": "?", "Date": time.strftime("%Y.%m.%d"), "Round": str(gameIndex + 1),
+            "White": configName("A", configA) if aIsWhite else configName("B", configB),
+            "Black": configName("B", configB) if aIsWhite else configName("A", configA),
+            "Termination": termination}
+    pgn = ChessPGN.gameToPGN(tags, ChessPGN.getGameSAN(gs.moveLog), result)
+    score = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}[result]
+    return gameIndex, score if aIsWhite else 1.0 - score, pgn
+
+#Elo difference of A over B and the half width of its 95% confidence interval, from the mean and spread of game scores
+def eloEstimate(wins, draws, losses):
+    games = wins + draws + losses
+    score = (wins + 0.5 * draws) / games
+    if score in (0.0, 1.0): #no finite estimate until both sides have scored
+        return (math.inf if score else -math.inf), math.inf
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    def elo(s):
+        s = min(max(s, 1e-6), 1 - 1e-6)
+        return 400 * math.log10(s / (1 - s))
+    return elo(score), (elo(score + margin) - elo(score - margin)) / 2
+
+def runMatch(games, configA, configB, pgnPath, workers, openingPlies, seed):
+    rng = random.Random(seed)
+    openings = [randomOpening(rng, openingPlies) for pair in range((games + 1) // 2)]
+    wins = draws = losses = 0
+    with open(pgnPath, "a") as pgnFile, concurrent.futures.ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(playGame, i, configA, configB, openings[i // 2], i % 2 == 0, rng.getrandbits(32)) for i in range(games)]
+        for future in concurrent.futures.as_completed(futures):
+            gameIndex, score, pgn = future.result()
+            pgnFile.write(pgn + "\n")
+            pgnFile.flush()
+            if score == 1.0:
+                wins += 1
+            elif score == 0.5:
+                draws += 1
+            else:
+                losses += 1
+            elo, margin = eloEstimate(wins, draws, losses)
+            print("game %d: A %s  W %d D %d L %d  Elo %+.0f +/- %.0f" % (gameIndex + 1, {1.0: "won", 0.5: "drew", 0.0: "lost"}[score], wins, draws, losses, elo, margin))
+    return wins, draws, losses
+
+def main():
+    parser = argparse.ArgumentParser(description = "Headless matches between two ChessAI configurations")
+    parser.add_argument("--games", type = int, default = 10)
+    parser.add_argument("--engine-a", nargs = "*", default = [], help = "KEY=VALUE options for engine A")
+    parser.add_argument("--engine-b", nargs = "*", default = [], help = "KEY=VALUE options for engine B")
+    parser.add_argument("--pgn", default = "selfplay.pgn", help = "finished games are appended here")
+    parser.add_argument("--workers", type = int, default = os.cpu_count() or 1)
+    parser.add_argument("--opening-plies", type = int, default = 4, help = "random plies before the engines take over")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+    configA = parseEngineConfig(args.engine_a)
+    configB = parseEngineConfig(args.engine_b)
+    print(configName("A", configA), "vs", configName("B", configB))
+    runMatch(args.games, configA, configB, args.pgn, args.workers, args.opening_plies, args.seed)
+
+if __name__ == "__main__":
+    main()
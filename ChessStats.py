@@ -0,0 +1,187 @@
+#Stats file: in charge of opt-in search statistics and the JSON report of every findBestMove call
+#usage: python ChessStats.py [--depth 4] [--save baseline.json] [--compare baseline.json]
+#enable() swaps the search, evaluation and move generation functions for counting wrappers and disable() puts the
+#originals back, so nothing is counted or timed while the collector is off
+import argparse
+import json
+import time
+import ChessEngine, ChessAI, ChessBenchmark
+
+#functions whose calls and cumulative time are reported: (owner, attribute)
+TIMED_FUNCTIONS = [(ChessEngine.GameState, "getValidMoves"), (ChessEngine.GameState, "getCaptureMoves"),
+                   (ChessEngine.GameState, "makeMove"), (ChessEngine.GameState, "undoMove"),
+                   (ChessAI, "scoreBoard")]
+
+originals = {} #(owner, attribute) -> function replaced by enable()
+reports = [] #report of every findBestMove call since enable()
+reportPath = None #reports are also appended here as JSON lines
+
+#counters of the search in progress
+nodesPerPly = []
+quiescencePerPly = []
+frames = [] #[moves searched, last move searched] of every main search node on the current path
+cutoffs = moveCutoffs = firstMoveCutoffs = interiorNodes = movesSearched = 0
+calls = {}
+times = {}
+
+def reset():
+    global nodesPerPly, quiescencePerPly, frames, cutoffs, moveCutoffs, firstMoveCutoffs, interiorNodes, movesSearched, calls, times
+    nodesPerPly = []
+    quiescencePerPly = []
+    frames = []
+    cutoffs = moveCutoffs = firstMoveCutoffs = interiorNodes = movesSearched = 0
+    calls = {attribute: 0 for owner, attribute in TIMED_FUNCTIONS}
+    times = {attribute: 0.0 for owner, attribute in TIMED_FUNCTIONS}
+
+def countPly(counts, ply):
+    while len(counts) <= ply:
+        counts.append(0)
+    counts[ply] += 1
+
+#main search node: nodes per ply, the moves each node searched and whether it failed high on the first one
+#a zero-window search and its re-search of the same move count as one move, a null move counts as none
+def trackedSearch(gs, validMoves, depth, alpha, beta, turnMultiplier, ply = 0):
+    global cutoffs, moveCutoffs, firstMoveCutoffs, interiorNodes, movesSearched
+    countPly(nodesPerPly, ply)
+    if frames and gs.moveLog and gs.moveLog[-1] is not None and gs.moveLog[-1] is not frames[-1][1]:
+        frames[-1][0] += 1
+        frames[-1][1] = gs.moveLog[-1]
+    frame = [0, None]
+    frames.append(frame)
+    try:
+        score = originals[(ChessAI, "findMinMaxWithAlphaBeta")](gs, validMoves, depth, alpha, beta, turnMultiplier, ply)
+    finally:
+        frames.pop()
+    if frame[0]:
+        interiorNodes += 1
+        movesSearched += frame[0]
+    if score >= beta and depth > 0:
+        cutoffs += 1
+        if frame[0]:
+            moveCutoffs += 1
+            if frame[0] == 1:
+                firstMoveCutoffs += 1
+    return score
+
+def trackedQuiescence(gs, alpha, beta, turnMultiplier, ply):
+    countPly(quiescencePerPly, ply)
+    return originals[(ChessAI, "quiescenceSearch")](gs, alpha, beta, turnMultiplier, ply)
+
+def timed(attribute, function):
+    def wrapper(*args, **kwargs):
+        startTime = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            calls[attribute] += 1
+            times[attribute] += time.perf_counter() - startTime
+    return wrapper
+
+#runs the search and files its report
+def trackedFindBestMove(gs, validMoves, *args, **kwargs):
+    reset()
+    fen = gs.getFEN()
+    startTime = time.perf_counter()
+    move = originals[(ChessAI, "findBestMove")](gs, validMoves, *args, **kwargs)
+    report = buildReport(fen, move, time.perf_counter() - startTime)
+    reports.append(report)
+    if reportPath is not None:
+        with open(reportPath, "a") as reportFile:
+            reportFile.write(json.dumps(report) + "\n")
+    return move
+
+def buildReport(fen, move, elapsed):
+    info = ChessAI.searchInfo
+    iterations = info.get('iterations', [])
+    return {
+        "fen": fen,
+        "move": move.getUCINotation() if move is not None else None,
+        "depth": info.get('depth', 0),
+        "score": info.get('score', 0),
+        "time": round(elapsed, 4),
+        "nodes": sum(nodesPerPly),
+        "quiescenceNodes": sum(quiescencePerPly),
+        "nodesPerPly": nodesPerPly,
+        "quiescenceNodesPerPly": quiescencePerPly,
+        "cutoffRate": round(cutoffs / max(sum(nodesPerPly), 1), 4),
+        "firstMoveCutoffRate": round(firstMoveCutoffs / max(moveCutoffs, 1), 4),
+        "branchingFactor": round(movesSearched / max(interiorNodes, 1), 3), #moves searched per node that searched any
+        "effectiveBranchingFactor": round(iterations[-1][1] / iterations[-2][1], 3) if len(iterations) > 1 else None,
+        "calls": dict(calls),
+        "seconds": {attribute: round(seconds, 4) for attribute, seconds in times.items()},
+    }
+
+def enable(path = None):
+    global reportPath
+    reportPath = path
+    if originals:
+        return
+    for owner, attribute in TIMED_FUNCTIONS:
+        originals[(owner, attribute)] = getattr(owner, attribute)
+        setattr(owner, attribute, timed(attribute, getattr(owner, attribute)))
+    for attribute, wrapper in (("findMinMaxWithAlphaBeta", trackedSearch), ("quiescenceSearch", trackedQuiescence), ("findBestMove", trackedFindBestMove)):
+        originals[(ChessAI, attribute)] = getattr(ChessAI, attribute)
+        setattr(ChessAI, attribute, wrapper)
+    reset()
+
+def disable():
+    for (owner, attribute), function in originals.items():
+        setattr(owner, attribute, function)
+    originals.clear()
+
+#one fixed-depth search of every benchmark position with the collector on, and the totals over the suite
+def runSuite(depth):
+    ChessAI.USE_BOOK = False
+    ChessAI.USE_ANALYSIS_CACHE = False
+    ChessAI.DEPTH = depth
+    del reports[:]
+    enable()
+    try:
+        for fen in ChessBenchmark.BENCHMARK_FENS:
+            gs = ChessEngine.GameState()
+            gs.loadFEN(fen)
+            ChessAI.transpositionTable.clear()
+            ChessAI.findBestMove(gs, gs.getValidMoves())
+    finally:
+        disable()
+    return {"depth": depth, "positions": list(reports), "totals": suiteTotals(reports)}
+
+def suiteTotals(positionReports):
+    totals = {key: round(sum(report[key] for report in positionReports), 4) for key in ("time", "nodes", "quiescenceNodes")}
+    for key in ("cutoffRate", "firstMoveCutoffRate", "branchingFactor", "effectiveBranchingFactor"):
+        values = [report[key] for report in positionReports if report[key] is not None]
+        totals[key] = round(sum(values) / len(values), 4) if values else None
+    for attribute in positionReports[0]["calls"] if positionReports else []:
+        totals[attribute + " calls"] = sum(report["calls"][attribute] for report in positionReports)
+        totals[attribute + " seconds"] = round(sum(report["seconds"][attribute] for report in positionReports), 4)
+    return totals
+
+#prints every total next to the baseline's and the change, and the positions whose best move changed
+def compareReports(baseline, current):
+    print("%-28s %14s %14s %9s" % ("", "baseline", "current", "change"))
+    for key, value in current["totals"].items():
+        old = baseline["totals"].get(key)
+        change = "%+8.1f%%" % (100 * (value - old) / old) if isinstance(old, (int, float)) and isinstance(value, (int, float)) and old else ""
+        print("%-28s %14s %14s %9s" % (key, old, value, change))
+    for old, new in zip(baseline["positions"], current["positions"]):
+        if old["move"] != new["move"]:
+            print("best move changed %s -> %s in %s" % (old["move"], new["move"], new["fen"]))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Search statistics over the benchmark positions")
+    parser.add_argument("--depth", type = int, default = 4)
+    parser.add_argument("--save", metavar = "PATH", help = "write the report as a baseline")
+    parser.add_argument("--compare", metavar = "PATH", help = "diff the report against a saved baseline")
+    args = parser.parse_args()
+    report = runSuite(args.depth)
+    if args.save:
+        with open(args.save, "w") as reportFile:
+            json.dump(report, reportFile, indent = 1)
+    if args.compare:
+        with open(args.compare) as reportFile:
+            compareReports(json.load(reportFile), report)
+    else:
+        print(json.dumps(report["totals"], indent = 1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+#Tablebase file: in charge of generating and probing endgame tablebases for 3 and 4 pieces
+#usage: python ChessTablebase.py generate KQvK KRvK KPvK [--dir tablebases]
+#       python ChessTablebase.py probe --fen FEN [--dir tablebases]
+import argparse
+import mmap
+import os
+import time
+import ChessEngine
+
+#a table holds one byte per index for a material signature such as KQvKR, white's pieces first
+#index = side to move, then the white king's square in the table's layout, then the squares of the other pieces in signature order
+#bytes are from the side to move's view: 0 draw, 1-125 win in that many plies, 128 + plies a loss,
+#255 an illegal index or the mirror image of a position stored at a lower index
+#castling rights and en passant captures are not part of tablebase positions, so signatures with pawns on both sides,
+#the only ones where an en passant capture can arise, are not generated
+DRAW = 0
+LOSS = 128
+ILLEGAL = 255
+UNKNOWN = 254 #only while generating
+MAX_PLIES = 125
+MAX_PIECES = 4
+PIECE_ORDER = "KQRBNP"
+PIECE_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+
+#the eight symmetries of the board as square maps, the identity first and the file mirror second
+def boardSymmetries():
+    symmetries = []
+    for swap in (False, True):
+        for flipRank in (False, True):
+            for flipFile in (False, True):
+                symmetry = []
+                for sq in range(64):
+                    r, c = divmod(sq, 8)
+                    if swap: #reflection in the a1-h8 diagonal
+                        r, c = 7 - c, 7 - r
+                    if flipRank:
+                        r = 7 - r
+                    if flipFile:
+                        c = 7 - c
+                    symmetry.append(r * 8 + c)
+                symmetries.append(symmetry)
+    return symmetries
+
+SYMMETRIES = boardSymmetries()
+
+#how the positions of a signature are laid out in its table
+#without pawns the board is rotated and mirrored until the white king is in the a1-d1-d4 triangle, 10 squares instead of 64,
+#pawns only allow the file mirror, which puts the white king on the a-d files
+class TableLayout():
+    def __init__(self, signature):
+        self.pieces = len(signature) - 1
+        hasPawns = 'P' in signature
+        symmetries = SYMMETRIES[:2] if hasPawns else SYMMETRIES
+        self.kingSquares = [sq for sq in range(64) if sq % 8 <= 3 and (hasPawns or 7 - sq // 8 <= sq % 8)]
+        kingDigits = {sq: i for i, sq in enumerate(self.kingSquares)}
+        #(symmetry, white king digit) of every symmetry that brings a white king on this square into the layout
+        self.kingSymmetries = [[(symmetry, kingDigits[symmetry[sq]]) for symmetry in symmetries if symmetry[sq] in kingDigits] for sq in range(64)]
+        self.pieceWeight = 64 ** (self.pieces - 1)
+        self.sideSize = len(self.kingSquares) * self.pieceWeight
+
+    #index of a position given by the squares of the pieces in signature order, the white king first
+    #a white king on the triangle's diagonal is placed by two symmetries, the lower index is the one stored
+    def index(self, squares, whiteMove):
+        best = None
+        for symmetry, index in self.kingSymmetries[squares[0]]:
+            for sq in squares[1:]:
+                index = index * 64 + symmetry[sq]
+            if best is None or index < best:
+                best = index
+        return best if whiteMove else best + self.sideSize
+
+    #squares and side to move of an index
+    def position(self, index):
+        rest = index % self.sideSize
+        squares = [self.kingSquares[rest // self.pieceWeight]]
+        squares.extend((rest >> (6 * i)) & 63 for i in range(self.pieces - 2, -1, -1))
+        return squares, index < self.sideSize
+
+layouts = {} #signature -> TableLayout
+
+def getLayout(signature):
+    if signature not in layouts:
+        layouts[signature] = TableLayout(signature)
+    return layouts[signature]
+
+#result and distance to mate in plies of a table byte
+def decodeValue(value):
+    if value == DRAW:
+        return "draw", 0
+    if value < LOSS:
+        return "win", value
+    return "loss", value - LOSS
+
+#white and black piece letters of a position, each ordered KQRBNP
+def materialOf(gs):
+    white = "".join(piece * bin(gs.bitboards['w' + piece]).count('1') for piece in PIECE_ORDER)
+    black = "".join(piece * bin(gs.bitboards['b' + piece]).count('1') for piece in PIECE_ORDER)
+    return white, black
+
+#the stronger side is white in a stored table, positions with the colors the other way round are mirrored
+def canonicalSignature(white, black):
+    if (sum(PIECE_VALUES[p] for p in black), black) > (sum(PIECE_VALUES[p] for p in white), white):
+        white, black = black, white
+    return white + "v" + black
+
+#(color, piece) of every index digit of a signature
+def signatureSlots(signature):
+    white, black = signature.split("v")
+    return [('w', piece) for piece in white] + [('b', piece) for piece in black]
+
+#signatures reached by a capture or a promotion, which must exist before this one is generated
+def subSignatures(signature):
+    white, black = signature.split("v")
+    subs = set()
+    for side, other, isWhite in ((white, black, True), (black, white, False)):
+        for i, piece in enumerate(side):
+            if piece == 'K':
+                continue
+            rest = side[:i] + side[i + 1:]
+            subs.add(canonicalSignature(rest, other) if isWhite else canonicalSignature(other, rest)) #captured
+            if piece == 'P':
+                for promoted in "QRBN":
+                    side2 = "".join(sorted(rest + promoted, key = PIECE_ORDER.index))
+                    subs.add(canonicalSignature(side2, other) if isWhite else canonicalSignature(other, side2))
+    subs.discard("KvK")
+    return subs
+
+class Tablebases():
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {} #signature -> mmap, or bytearray while generating
+        self.files = []
+        self.available = set()
+        if os.path.isdir(directory): #files of another size were written with another layout and are left out
+            self.available = {name[:-3] for name in os.listdir(directory) if name.endswith(".tb") and
+                              os.path.getsize(os.path.join(directory, name)) == 2 * getLayout(name[:-3]).sideSize}
+        self.maxPieces = max([len(signature) - 1 for signature in self.available] + [0])
+
+    def close(self):
+        for table in self.tables.values():
+            if isinstance(table, mmap.mmap):
+                table.close()
+        for tableFile in self.files:
+            tableFile.close()
+        self.tables = {}
+        self.files = []
+
+    def getTable(self, signature):
+        table = self.tables.get(signature)
+        if table is None and signature in self.available:
+            tableFile = open(os.path.join(self.directory, signature + ".tb"), "rb")
+            self.files.append(tableFile)
+            table = self.tables[signature] = mmap.mmap(tableFile.fileno(), 0, access = mmap.ACCESS_READ)
+        return table
+
+    #table byte of the position for the side to move, None when no table covers it
+    def probe(self, gs):
+        if gs.castlingRights:
+            return None
+        if gs.enPassantPossible != (): #only matters when a pawn stands ready to capture
+            epRow, epCol = gs.enPassantPossible
+            pawnRow = epRow + 1 if gs.whiteMove else epRow - 1
+            pawn = 'wP' if gs.whiteMove else 'bP'
+            if any(0 <= c < 8 and gs.board[pawnRow][c] == pawn for c in (epCol - 1, epCol + 1)):
+                return None
+        white, black = materialOf(gs)
+        if white == "K" and black == "K":
+            return DRAW
+        if len(white) + len(black) > MAX_PIECES:
+            return None
+        signature = canonicalSignature(white, black)
+        table = self.getTable(signature)
+        if table is None:
+            return None
+        flip = signature != white + "v" + black #stored with the colors swapped
+        squares = []
+        pieceSquares = {}
+        for color, piece in signatureSlots(signature):
+            if flip:
+                color = 'b' if color == 'w' else 'w'
+            if color + piece not in pieceSquares: #identical pieces take their squares in order, the table holds every ordering
+                pieceSquares[color + piece] = list(ChessEngine.bitSquares(gs.bitboards[color + piece]))
+            sq = pieceSquares[color + piece].pop(0)
+            squares.append(sq ^ 56 if flip else sq)
+        return table[getLayout(signature).index(squares, gs.whiteMove != flip)]
+
+    #writes the table of a signature, generating missing capture and promotion tables first
+    def generate(self, signature, log = print):
+        white, black = signature.split("v")
+        if 'P' in white and 'P' in black:
+            raise ValueError(signature + " has pawns on both sides, en passant captures are not part of tablebase positions")
+        for sub in sorted(subSignatures(signature), key = len):
+            if sub not in self.available:
+                self.generate(sub, log)
+        startTime = time.time()
+        values = generateTable(signature, self)
+        os.makedirs(self.directory, exist_ok = True)
+        with open(os.path.join(self.directory, signature + ".tb"), "wb") as tableFile:
+            tableFile.write(values)
+        self.tables[signature] = values
+        self.available.add(signature)
+        self.maxPieces = max(self.maxPieces, len(signature) - 1)
+        wins = sum(1 for value in values if 0 < value < LOSS)
+        losses = sum(1 for value in values if LOSS <= value < ILLEGAL)
+        draws = sum(1 for value in values if value == DRAW)
+        longest = max([value for value in values if value < LOSS] + [0])
+        log("%s: %d wins, %d losses, %d draws, longest mate %d plies, %.1fs" % (signature, wins, losses, draws, longest, time.time() - startTime))
+
+#places the pieces on a reused GameState with no castling rights and no en passant square
+def setupPosition(gs, slots, squares, whiteMove):
+    for r in range(8):
+        for c in range(8):
+            gs.board[r][c] = "--"
+    gs.bitboards = {color + piece: 0 for color in 'wb' for piece in 'PRNBQK'}
+    gs.occupancy = {'w': 0, 'b': 0}
+    for (color, piece), sq in zip(slots, squares):
+        gs.board[sq // 8][sq % 8] = color + piece
+        gs.flipPiece(color + piece, sq)
+        if piece == 'K':
+            if color == 'w':
+                gs.wK_Location = ChessEngine.SQUARES[sq]
+            else:
+                gs.bK_Location = ChessEngine.SQUARES[sq]
+    gs.whiteMove = whiteMove
+    gs.castlingRights = 0
+    gs.enPassantPossible = ()
+    gs.halfmoveClock = 0
+    gs.moveLog = []
+    gs.stateLog = []
+
+#retrograde analysis of one signature, the tables it depends on must already be available
+def generateTable(signature, tablebases):
+    slots = signatureSlots(signature)
+    n = len(slots)
+    layout = getLayout(signature)
+    size = 2 * layout.sideSize
+    values = bytearray([UNKNOWN]) * size
+    counts = bytearray(size) #positions reached by a move that are not yet won by the opponent, mirror images count once
+    lossFloors = bytearray(size) #a loss can be no shorter than the longest forced capture or promotion
+    pendingWins = {} #ply -> indexes won by a capture or promotion in that many plies
+    pendingLosses = {} #ply -> indexes whose every move was already resolved as losing
+    current = [] #indexes decided at the ply being processed
+    gs = ChessEngine.GameState()
+
+    #forward pass: legality, mates and stalemates, move counts, and the results of moves that leave the table
+    for index in range(size):
+        squares, whiteMove = layout.position(index)
+        if len(set(squares)) < n or any(piece == 'P' and (sq < 8 or sq >= 56) for (color, piece), sq in zip(slots, squares)) or \
+           layout.index(squares, whiteMove) != index:
+            values[index] = ILLEGAL
+            continue
+        setupPosition(gs, slots, squares, whiteMove)
+        enemyColor = 'b' if whiteMove else 'w'
+        if gs.isAttacked(gs.bitboards[enemyColor + 'K'].bit_length() - 1, 'w' if whiteMove else 'b'):
+            values[index] = ILLEGAL #the side that just moved is in check
+            continue
+        moves = gs.getValidMoves()
+        if len(moves) == 0:
+            if gs.inCheck():
+                values[index] = LOSS
+                current.append(index)
+            else:
+                values[index] = DRAW
+            continue
+        quietMoves = set() #indexes reached without a capture or promotion
+        count = 0
+        bestWin = 0
+        lossFloor = 0
+        for move in moves:
+            if move.pieceCaptured == '--' and not move.isPawnPromotion:
+                start = move.startRow * 8 + move.startCol
+                quietMoves.add(layout.index([move.endRow * 8 + move.endCol if sq == start else sq for sq in squares], not whiteMove))
+                continue
+            gs.makeMove(move)
+            result, plies = decodeValue(tablebases.probe(gs))
+            gs.undoMove()
+            if result == "loss":
+                bestWin = plies + 1 if bestWin == 0 else min(bestWin, plies + 1)
+            elif result == "win":
+                lossFloor = max(lossFloor, plies + 1)
+            else:
+                count += 1 #a drawing move keeps the position from being lost
+        count += len(quietMoves)
+        if bestWin:
+            count += 1 #already won, never a loss
+            pendingWins.setdefault(bestWin, []).append(index)
+        elif count == 0:
+            pendingLosses.setdefault(lossFloor, []).append(index)
+        counts[index] = count
+        lossFloors[index] = lossFloor
+
+    #backward pass: positions decided at ply n decide their predecessors at ply n + 1
+    ply = 0
+    while True:
+        for index in pendingWins.pop(ply, []):
+            if values[index] == UNKNOWN:
+                values[index] = ply
+                current.append(index)
+        for index in pendingLosses.pop(ply, []):
+            if values[index] == UNKNOWN:
+                values[index] = LOSS + ply
+                current.append(index)
+        if not current and not pendingWins and not pendingLosses:
+            break
+        if ply >= MAX_PLIES:
+            raise ValueError(signature + " has mates longer than the table format allows")
+        nextLayer = []
+        for index in current:
+            lost = values[index] >= LOSS
+            for predecessor in predecessors(index, slots, layout):
+                if values[predecessor] != UNKNOWN:
+                    continue
+                if lost: #a move into a lost position wins
+                    values[predecessor] = ply + 1
+                    nextLayer.append(predecessor)
+                else:
+                    counts[predecessor] -= 1
+                    if counts[predecessor] == 0: #every move loses
+                        if lossFloors[predecessor] <= ply + 1:
+                            values[predecessor] = LOSS + ply + 1
+                            nextLayer.append(predecessor)
+                        else:
+                            pendingLosses.setdefault(lossFloors[predecessor], []).append(predecessor)
+        current = nextLayer
+        ply += 1
+    for index in range(size):
+        if values[index] == UNKNOWN:
+            values[index] = DRAW
+    return values
+
+#indexes one quiet move before this one: the side not to move takes back a move that did not capture or promote
+#each index is listed once, however many of its moves reach this position or its mirror images
+def predecessors(index, slots, layout):
+    squares, whiteMove = layout.position(index)
+    occupied = 0
+    for sq in squares:
+        occupied |= 1 << sq
+    empty = ~occupied
+    moved = 'b' if whiteMove else 'w'
+    result = set()
+    for i, (color, piece) in enumerate(slots):
+        if color != moved:
+            continue
+        sq = squares[i]
+        if piece == 'P':
+            origins = 0
+            step = 8 if color == 'w' else -8 #pawns came from behind
+            back = sq + step
+            if 8 <= back < 56 and empty & (1 << back):
+                origins |= 1 << back
+                if sq // 8 == (4 if color == 'w' else 3) and empty & (1 << (back + step)):
+                    origins |= 1 << (back + step)
+        elif piece == 'N':
+            origins = ChessEngine.KNIGHT_ATTACKS[sq] & empty
+        elif piece == 'K':
+            origins = ChessEngine.KING_ATTACKS[sq] & empty
+        elif piece == 'R':
+            origins = ChessEngine.rookAttacks(sq, occupied) & empty
+        elif piece == 'B':
+            origins = ChessEngine.bishopAttacks(sq, occupied) & empty
+        else:
+            origins = (ChessEngine.rookAttacks(sq, occupied) | ChessEngine.bishopAttacks(sq, occupied)) & empty
+        for origin in ChessEngine.bitSquares(origins):
+            squares[i] = origin
+            result.add(layout.index(squares, not whiteMove))
+        squares[i] = sq
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description = "Endgame tablebases for ChessAI")
+    parser.add_argument("--dir", default = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases"))
+    commands = parser.add_subparsers(dest = "command", required = True)
+    generate = commands.add_parser("generate", help = "generate tables such as KQvK or KRvKB and the tables they need")
+    generate.add_argument("signatures", nargs = "+")
+    probe = commands.add_parser("probe", help = "look up a position")
+    probe.add_argument("--fen", required = True)
+    args = parser.parse_args()
+
+    tablebases = Tablebases(args.dir)
+    if args.command == "generate":
+        for signature in args.signatures:
+            white, black = signature.upper().split("V")
+            if len(white) + len(black) > MAX_PIECES or white[0] != 'K' or black[0] != 'K':
+                raise SystemExit("signatures have two kings and at most %d pieces: %s" % (MAX_PIECES, signature))
+            if 'P' in white and 'P' in black:
+                raise SystemExit("signatures with pawns on both sides need en passant, which tables do not hold: %s" % signature)
+            signature = canonicalSignature(white, black)
+            if signature not in tablebases.available:
+                tablebases.generate(signature)
+    else:
+        gs = ChessEngine.GameState()
+        gs.loadFEN(args.fen)
+        value = tablebases.probe(gs)
+        if value is None:
+            print("not in the tablebases")
+        elif value == ILLEGAL:
+            print("illegal position")
+        else:
+            result, plies = decodeValue(value)
+            print(result if result == "draw" else "%s in %d plies" % (result, plies))
+    tablebases.close()
+
+if __name__ == "__main__":
+    main()
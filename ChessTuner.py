@@ -0,0 +1,200 @@
+#Tuner file: in charge of fitting the evaluation weights to game results (Texel tuning)
+#usage: python ChessTuner.py extract games.pgn positions.txt [--skip-plies 8]
+#       python ChessTuner.py prepare positions.txt positions.bin
+#       python ChessTuner.py tune positions.bin [--epochs 50] [--workers N] [--out weights.npz] [--resume] [--no-mobility]
+import argparse
+import math
+import multiprocessing
+import os
+import time
+import numpy as np
+import ChessEngine, ChessEval, ChessPGN
+
+#one prepared position: its bitboards in ChessEval.PLANES order, phase and the game result for white
+RECORD = np.dtype([('boards', '<u8', (len(ChessEval.PLANES),)), ('phase', 'u1'), ('result', '<f4')])
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5, "1.0": 1.0, "0.5": 0.5, "0.0": 0.0}
+CHUNK = 16384 #positions per gradient task
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.npz")
+
+#(FEN, result) of a dataset line, None for lines without a result
+#takes "FEN result", "FEN [result]" and EPD lines with c9 "result", results as 1-0/0-1/1/2-1/2 or 1.0/0.5/0.0
+def parseLine(line):
+    fields = line.replace('"', ' ').replace(';', ' ').replace('[', ' ').replace(']', ' ').replace(',', ' ').split()
+    if len(fields) < 3 or fields[-1] not in RESULTS:
+        return None
+    fenFields = fields[:4]
+    for field in fields[4:min(6, len(fields) - 1)]: #clocks when present, EPD lines have operations instead
+        if not field.isdigit():
+            break
+        fenFields.append(field)
+    return " ".join(fenFields), RESULTS[fields[-1]]
+
+#writes "FEN result" lines for the positions of every game in a PGN file
+#the opening plies and positions in check or just after a capture are left out, their score says little about the result
+def extractPositions(pgnPath, outPath, skipPlies = 8):
+    games = positions = 0
+    with open(outPath, "w") as outFile:
+        for tags, sanMoves, result in ChessPGN.readGames(pgnPath):
+            if result not in ("1-0", "0-1", "1/2-1/2"):
+                continue
+            gs = ChessEngine.GameState()
+            if "FEN" in tags:
+                gs.loadFEN(tags["FEN"])
+            games += 1
+            for ply, san in enumerate(sanMoves):
+                move = ChessPGN.parseSAN(gs, san, gs.getValidMoves())
+                if move is None:
+                    break
+                gs.makeMove(move)
+                if ply + 1 >= skipPlies and move.pieceCaptured == '--' and not gs.inCheck():
+                    outFile.write(gs.getFEN() + " " + result + "\n")
+                    positions += 1
+    return games, positions
+
+#streams a text dataset into the binary file the tuner reads, a batch at a time
+def preparePositions(textPath, binPath, batchSize = 65536):
+    gs = ChessEngine.GameState()
+    count = skipped = 0
+    batch = []
+    with open(textPath, encoding = "utf-8", errors = "replace") as textFile, open(binPath, "wb") as binFile:
+        for line in textFile:
+            parsed = parseLine(line)
+            if parsed is None:
+                skipped += 1
+                continue
+            try:
+                gs.loadFEN(parsed[0])
+            except (ValueError, KeyError, IndexError):
+                skipped += 1
+                continue
+            boards, phase = ChessEval.positionFeatures(gs)
+            batch.append((boards, min(phase, ChessEngine.TOTAL_PHASE), parsed[1]))
+            if len(batch) == batchSize:
+                np.array(batch, dtype = RECORD).tofile(binFile)
+                count += len(batch)
+                batch = []
+        if batch:
+            np.array(batch, dtype = RECORD).tofile(binFile)
+            count += len(batch)
+    return count, skipped
+
+def openPositions(binPath):
+    return np.memmap(binPath, dtype = RECORD, mode = 'r')
+
+#expected score for white of evaluations in centipawns, k scales centipawns to winning chances
+def winProbability(scores, k):
+    return 1 / (1 + np.power(10, -k * scores / 400))
+
+#runs in a worker: squared error sum and its gradient for the weights over positions start to end
+#with kValues the error is summed for every k instead and no gradient is taken, for fitting k
+def chunkGradient(task):
+    binPath, start, end, weights, k, kValues = task
+    records = openPositions(binPath)[start:end]
+    features, phases = ChessEval.encodeBoards(records['boards'], records['phase'])
+    results = records['result'].astype(np.float32)
+    mg, eg = (features @ weights).T
+    middlegame = phases / ChessEngine.TOTAL_PHASE
+    scores = mg * middlegame + eg * (1 - middlegame)
+    if kValues is not None:
+        return np.array([((winProbability(scores, kValue) - results) ** 2).sum() for kValue in kValues]), None
+    probability = winProbability(scores, k)
+    difference = probability - results
+    slope = 2 * difference * probability * (1 - probability) * k * math.log(10) / 400 #d error / d score
+    gradient = np.stack([features.T @ (slope * middlegame), features.T @ (slope * (1 - middlegame))], axis = 1)
+    return (difference ** 2).sum(), gradient
+
+#sums chunkGradient over the whole file, on a process pool when there is one
+def datasetGradient(pool, binPath, count, weights, k, kValues = None):
+    tasks = [(binPath, start, min(start + CHUNK, count), weights, k, kValues) for start in range(0, count, CHUNK)]
+    error = 0
+    gradient = np.zeros_like(weights)
+    for chunkError, chunkGrad in (pool.imap_unordered(chunkGradient, tasks) if pool is not None else map(chunkGradient, tasks)):
+        error = error + chunkError
+        if chunkGrad is not None:
+            gradient += chunkGrad
+    return error / count, gradient / count
+
+#the k that best matches the current weights to the results: a coarse scan, then a finer one around the best
+def fitK(pool, binPath, count, weights):
+    best = 1.0
+    for step in (0.1, 0.01):
+        kValues = best + step * np.arange(-10, 11)
+        kValues = kValues[kValues > 0]
+        errors, gradient = datasetGradient(pool, binPath, count, weights, None, kValues)
+        best = float(kValues[int(np.argmin(errors))])
+    return best
+
+#Adam over the full dataset each epoch, with the state saved to the checkpoint after every epoch
+#without mobility its weights stay at zero, so the AI can use the result without BATCH_EVAL
+def tune(binPath, epochs, learningRate, workers, outPath, checkpointPath, resume, mobility = True):
+    count = len(openPositions(binPath))
+    if count == 0:
+        raise SystemExit("no positions in " + binPath)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        if resume and os.path.exists(checkpointPath):
+            with np.load(checkpointPath) as checkpoint:
+                weights, moment, velocity = checkpoint["weights"], checkpoint["moment"], checkpoint["velocity"]
+                firstEpoch, k = int(checkpoint["epoch"]), float(checkpoint["k"])
+            print("resuming at epoch", firstEpoch + 1, "k %.3f" % k)
+        else:
+            weights = ChessEval.Evaluator(outPath if resume and os.path.exists(outPath) else None).weights
+            if not mobility:
+                weights[len(ChessEval.PLANES) * 64:] = 0
+            moment = np.zeros_like(weights)
+            velocity = np.zeros_like(weights)
+            firstEpoch = 0
+            k = fitK(pool, binPath, count, weights)
+            print("positions", count, "k %.3f" % k)
+        beta1, beta2 = 0.9, 0.999
+        for epoch in range(firstEpoch, epochs):
+            startTime = time.time()
+            error, gradient = datasetGradient(pool, binPath, count, weights, k)
+            if not mobility:
+                gradient[len(ChessEval.PLANES) * 64:] = 0
+            moment = beta1 * moment + (1 - beta1) * gradient
+            velocity = beta2 * velocity + (1 - beta2) * gradient ** 2
+            step = learningRate * (moment / (1 - beta1 ** (epoch + 1))) / (np.sqrt(velocity / (1 - beta2 ** (epoch + 1))) + 1e-8)
+            weights = (weights - step).astype(np.float32)
+            np.savez(checkpointPath, weights = weights, moment = moment, velocity = velocity, epoch = epoch + 1, k = k)
+            print("epoch %d error %.6f %.1fs" % (epoch + 1, error, time.time() - startTime))
+    finally:
+        if pool is not None:
+            pool.close()
+    evaluator = ChessEval.Evaluator()
+    evaluator.weights = weights
+    evaluator.save(outPath)
+    print("weights written to", outPath)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Texel tuning of the evaluation weights")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    extract = commands.add_parser("extract", help = "write labeled positions from the games of a PGN file")
+    extract.add_argument("pgn")
+    extract.add_argument("positions")
+    extract.add_argument("--skip-plies", type = int, default = 8)
+    prepare = commands.add_parser("prepare", help = "convert labeled FEN lines to the tuner's binary format")
+    prepare.add_argument("positions")
+    prepare.add_argument("bin")
+    tuneCommand = commands.add_parser("tune", help = "fit the weights to a prepared file")
+    tuneCommand.add_argument("bin")
+    tuneCommand.add_argument("--epochs", type = int, default = 50)
+    tuneCommand.add_argument("--learning-rate", type = float, default = 1.0, help = "largest change of a weight per epoch in centipawns")
+    tuneCommand.add_argument("--workers", type = int, default = os.cpu_count() or 1)
+    tuneCommand.add_argument("--out", default = DEFAULT_OUT, help = "weights file, the one ChessAI loads by default")
+    tuneCommand.add_argument("--checkpoint", default = "tune.ckpt.npz")
+    tuneCommand.add_argument("--resume", action = "store_true", help = "continue from the checkpoint, or from the weights file")
+    tuneCommand.add_argument("--no-mobility", action = "store_true", help = "piece-square weights only, which the AI can use without BATCH_EVAL")
+    args = parser.parse_args()
+
+    if args.command == "extract":
+        games, positions = extractPositions(args.pgn, args.positions, args.skip_plies)
+        print("games", games, "positions", positions)
+    elif args.command == "prepare":
+        count, skipped = preparePositions(args.positions, args.bin)
+        print("positions", count, "skipped lines", skipped)
+    else:
+        tune(args.bin, args.epochs, args.learning_rate, args.workers, args.out, args.checkpoint, args.resume, not args.no_mobility)
+
+if __name__ == "__main__":
+    main()
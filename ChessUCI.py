@@ -0,0 +1,204 @@
+#UCI file: in charge of running the AI as a UCI engine over stdin and stdout, without the pygame window
+#usage: python ChessUCI.py, or add that command to a chess GUI or tournament manager as a UCI engine
+import sys
+import threading
+import ChessEngine, ChessAI
+
+ENGINE_NAME = "Chess-Game-AI"
+ENGINE_AUTHOR = "SP-14-Red"
+MOVE_OVERHEAD = 0.05 #seconds kept back from every move for the GUI and the pipe
+MOVES_TO_GO = 30 #moves the remaining time is shared over when the GUI does not say
+
+#seconds to search under the go parameters, None when the GUI set no clock
+def searchTime(whiteMove, params):
+    if "movetime" in params:
+        return max(0.01, params["movetime"] / 1000 - MOVE_OVERHEAD)
+    remaining = params.get("wtime" if whiteMove else "btime")
+    if remaining is None:
+        return None
+    remaining /= 1000
+    increment = params.get("winc" if whiteMove else "binc", 0) / 1000
+    budget = remaining / params.get("movestogo", MOVES_TO_GO) + increment * 0.75
+    return max(0.01, min(budget, remaining / 2 - MOVE_OVERHEAD))
+
+#UCI score of a search score for the side to move, a mate score holds its distance in plies
+def scoreText(score):
+    if abs(score) >= ChessAI.MATE_BOUND:
+        moves = (ChessAI.CHECKMATE - abs(score) + 1) // 2
+        return "mate %d" % (moves if score > 0 else -moves)
+    return "cp %d" % score
+
+class UCIEngine():
+    def __init__(self, out = sys.stdout):
+        self.out = out
+        self.outputLock = threading.Lock()
+        self.gs = ChessEngine.GameState()
+        self.searchThread = None
+        self.stopEvent = None
+        #name -> (option line sent on uci, setter taking the value string)
+        self.options = {
+            "Hash": ("type spin default %d min 1 max 4096" % ChessAI.HASH_SIZE_MB, self.setHash),
+            "OwnBook": ("type check default %s" % str(ChessAI.USE_BOOK).lower(), lambda value: setattr(ChessAI, "USE_BOOK", value == "true")),
+            "BookFile": ("type string default " + ChessAI.BOOK_FILE, self.setBookFile),
+            "Tablebases": ("type check default %s" % str(ChessAI.USE_TABLEBASES).lower(), self.setTablebases),
+            "TablebasePath": ("type string default " + ChessAI.TABLEBASE_DIR, self.setTablebasePath),
+            "SelectiveSearch": ("type check default %s" % str(ChessAI.SELECTIVE_SEARCH).lower(), lambda value: setattr(ChessAI, "SELECTIVE_SEARCH", value == "true")),
+            "AnalysisCache": ("type check default %s" % str(ChessAI.USE_ANALYSIS_CACHE).lower(), lambda value: setattr(ChessAI, "USE_ANALYSIS_CACHE", value == "true")),
+            "AnalysisCacheFile": ("type string default " + ChessAI.ANALYSIS_CACHE_FILE, lambda value: setattr(ChessAI, "ANALYSIS_CACHE_FILE", value)),
+            "BatchEval": ("type check default %s" % str(ChessAI.BATCH_EVAL).lower(), lambda value: setattr(ChessAI, "BATCH_EVAL", value == "true")),
+            "TunedWeights": ("type check default %s" % str(ChessAI.TUNED_WEIGHTS).lower(), self.setTunedWeights),
+            "Threads": ("type spin default %d min 1 max 256" % ChessAI.THREADS, lambda value: setattr(ChessAI, "THREADS", int(value))),
+        }
+
+    def send(self, line):
+        with self.outputLock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def setHash(self, value):
+        ChessAI.HASH_SIZE_MB = int(value)
+        ChessAI.transpositionTable.resize(ChessAI.HASH_SIZE_MB)
+
+    def setBookFile(self, value):
+        if ChessAI.openingBook is not None:
+            ChessAI.openingBook.close()
+            ChessAI.openingBook = None
+        ChessAI.BOOK_FILE = value
+
+    #the position set up before is rescored when the piece-square tables change
+    def setTunedWeights(self, value):
+        ChessAI.TUNED_WEIGHTS = value == "true"
+        if ChessAI.applyTunedWeights():
+            self.gs.loadBitboards()
+
+    def setTablebases(self, value):
+        ChessAI.USE_TABLEBASES = value == "true"
+        ChessAI.loadTablebases()
+
+    def setTablebasePath(self, value):
+        if ChessAI.tablebases is not None:
+            ChessAI.tablebases.close()
+            ChessAI.tablebases = None
+        ChessAI.TABLEBASE_DIR = value
+
+    #handles one command line, returns False on quit
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+        if command == "uci":
+            self.send("id name " + ENGINE_NAME)
+            self.send("id author " + ENGINE_AUTHOR)
+            for name, (declaration, setter) in self.options.items():
+                self.send("option name %s %s" % (name, declaration))
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stopSearch()
+            ChessAI.transpositionTable.clear()
+            for piece in ChessAI.historyTable:
+                ChessAI.historyTable[piece] = [0] * 64
+        elif command == "setoption":
+            self.stopSearch()
+            self.setOption(tokens[1:])
+        elif command == "position":
+            self.stopSearch()
+            self.setPosition(tokens[1:])
+        elif command == "go":
+            self.stopSearch()
+            self.go(tokens[1:])
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "quit":
+            self.stopSearch()
+            return False
+        return True
+
+    #setoption name <name> [value <value>], names and values may contain spaces
+    def setOption(self, tokens):
+        if "name" not in tokens:
+            return
+        end = tokens.index("value") if "value" in tokens else len(tokens)
+        name = " ".join(tokens[tokens.index("name") + 1:end])
+        value = " ".join(tokens[end + 1:])
+        for optionName, (declaration, setter) in self.options.items():
+            if optionName.lower() == name.lower():
+                setter(value.lower() if declaration.startswith("type check") else value)
+                return
+        self.send("info string unknown option " + name)
+
+    #position startpos|fen <fen> [moves <move>...]
+    def setPosition(self, tokens):
+        gs = ChessEngine.GameState()
+        movesAt = tokens.index("moves") if "moves" in tokens else len(tokens)
+        if tokens and tokens[0] == "fen":
+            gs.loadFEN(" ".join(tokens[1:movesAt]))
+        for notation in tokens[movesAt + 1:]:
+            move = next((move for move in gs.getValidMoves() if move.getUCINotation() == notation), None)
+            if move is None:
+                self.send("info string illegal move " + notation)
+                break
+            gs.makeMove(move)
+        self.gs = gs
+
+    #go [wtime btime winc binc movestogo movetime depth nodes <n>] [infinite], a bare go searches until stop
+    def go(self, tokens):
+        params = {}
+        for i, token in enumerate(tokens[:-1]):
+            if token in ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes"):
+                params[token] = int(tokens[i + 1])
+        validMoves = self.gs.getValidMoves()
+        if len(validMoves) == 0:
+            self.send("bestmove 0000")
+            return
+        timeLimit = searchTime(self.gs.whiteMove, params)
+        infinite = "infinite" in tokens or (timeLimit is None and "depth" not in params and "nodes" not in params)
+        depthLimit = params.get("depth", ChessAI.MAX_DEPTH)
+        self.stopEvent = threading.Event()
+        self.searchThread = threading.Thread(target = self.search, args = (self.gs, validMoves, timeLimit, params.get("nodes"), depthLimit, infinite), daemon = True)
+        self.searchThread.start()
+
+    #runs on the search thread, bestmove is held back until stop when searching without limits
+    def search(self, gs, validMoves, timeLimit, nodeLimit, depthLimit, infinite):
+        move = ChessAI.findBestMove(gs, validMoves, timeLimit, nodeLimit, self.stopEvent, depthLimit, self.sendInfo)
+        if ChessAI.searchInfo.get("book"):
+            self.send("info string book move")
+        elif ChessAI.searchInfo.get("tablebase"):
+            self.send("info string tablebase move")
+        elif ChessAI.searchInfo.get("cached"):
+            self.sendInfo(ChessAI.searchInfo)
+            self.send("info string analysis cache move")
+        if move is None: #stopped before the first depth finished
+            move = validMoves[0]
+        if infinite:
+            self.stopEvent.wait()
+        self.send("bestmove " + move.getUCINotation())
+
+    def sendInfo(self, info):
+        self.send("info depth %d score %s nodes %d nps %d time %d hashfull %d pv %s" % (info['depth'], scoreText(info['score']),
+                  info['nodes'], info['nps'], int(info['time'] * 1000), ChessAI.transpositionTable.hashfull(), " ".join(move.getUCINotation() for move in info['pv'])))
+
+    #stops a running search and waits for its bestmove
+    def stopSearch(self):
+        if self.searchThread is not None:
+            self.stopEvent.set()
+            self.searchThread.join()
+            self.searchThread = None
+
+def main():
+    ChessAI.TUNED_WEIGHTS = True #weights.npz from ChessTuner when there is one, the TunedWeights option turns it off
+    ChessAI.applyTunedWeights()
+    engine = UCIEngine()
+    #a second file object over stdin: search processes of the Threads option close sys.stdin as they start,
+    #which would wait forever for the lock a pending sys.stdin.readline holds
+    commands = open(sys.stdin.fileno(), closefd = False)
+    while True:
+        line = commands.readline()
+        if not line or not engine.handle(line.strip()):
+            break
+    ChessAI.shutdownProcessPool()
+
+if __name__ == "__main__":
+    main()
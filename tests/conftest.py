@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+#the modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#tests marked slow, such as generating a 4-piece tablebase, only run with --runslow
+def pytest_addoption(parser):
+    parser.addoption("--runslow", action = "store_true", help = "also run the slow tests")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: takes minutes, skipped without --runslow")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+    skip = pytest.mark.skip(reason = "needs --runslow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
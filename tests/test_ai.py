@@ -0,0 +1,112 @@
+import threading
+import time
+import warnings
+import pytest
+import ChessEngine, ChessAI
+
+#a deeper entry of the current search keeps its slot, an entry from an earlier search gives it up
+def test_transposition_table_replacement():
+    table = ChessAI.TranspositionTable(0.001)
+    key = 12345
+    other = key + table.size #same slot
+    table.store(key, 4, ChessAI.EXACT, 50, None)
+    assert table.probe(key)[1:4] == (4, ChessAI.EXACT, 50)
+    assert table.probe(other) is None
+    table.store(other, 2, ChessAI.LOWERBOUND, 10, None)
+    assert table.probe(key) is not None and table.probe(other) is None
+    table.newSearch()
+    table.store(other, 2, ChessAI.LOWERBOUND, 10, None)
+    assert table.probe(other) is not None and table.probe(key) is None
+    assert table.used == 1
+
+def position(fen):
+    gs = ChessEngine.GameState()
+    gs.loadFEN(fen)
+    return gs
+
+#a mate scores by its distance, so the search reports the shortest one
+def test_mate_distance(monkeypatch):
+    monkeypatch.setattr(ChessAI, "DEPTH", 5)
+    gs = position("k7/8/2K5/8/8/8/8/7R w - - 0 1")
+    move = ChessAI.findBestMove(gs, gs.getValidMoves())
+    assert move is not None
+    assert ChessAI.searchInfo['score'] == ChessAI.CHECKMATE - 3 #mate in 2
+
+#a check at the ply limit is not searched further, both searches fall back to the static score
+def test_check_at_max_ply():
+    gs = position("4k3/8/8/8/8/8/4q3/4K3 w - - 0 1")
+    assert gs.inCheck()
+    score = ChessAI.quiescenceSearch(gs, -ChessAI.CHECKMATE, ChessAI.CHECKMATE, 1, ChessAI.MAX_PLY + 1)
+    assert score == ChessAI.scoreBoard(gs)
+    score = ChessAI.findMinMaxWithAlphaBeta(gs, gs.getValidMoves(), 3, -ChessAI.CHECKMATE, ChessAI.CHECKMATE, 1, ChessAI.MAX_PLY)
+    assert score == ChessAI.scoreBoard(gs)
+
+#workers narrowing their window to the shared root alpha still agree with the serial search
+def test_parallel_matches_serial(monkeypatch):
+    monkeypatch.setattr(ChessAI, "DEPTH", 3)
+    monkeypatch.setattr(ChessAI, "USE_BOOK", False)
+    try:
+        for fen in [ChessEngine.START_FEN, "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"]:
+            gs = position(fen)
+            ChessAI.findBestMove(gs, gs.getValidMoves())
+            serialScore = ChessAI.searchInfo['score']
+            ChessAI.findBestMoveParallel(gs, gs.getValidMoves(), depth = 3, workers = 2)
+            assert ChessAI.searchInfo['score'] == serialScore
+    finally:
+        ChessAI.shutdownProcessPool()
+
+#with THREADS above 1 findBestMove searches in parallel and keeps to its time budget and cancel event
+def test_threads_limits(monkeypatch):
+    monkeypatch.setattr(ChessAI, "THREADS", 2)
+    monkeypatch.setattr(ChessAI, "USE_BOOK", False)
+    try:
+        gs = position(ChessEngine.START_FEN)
+        startTime = time.time()
+        move = ChessAI.findBestMove(gs, gs.getValidMoves(), timeLimit = 0.5)
+        assert move is not None and ChessAI.searchInfo['depth'] >= 1
+        assert time.time() - startTime < 5
+        cancelEvent = threading.Event()
+        cancelEvent.set()
+        assert ChessAI.findBestMove(gs, gs.getValidMoves(), cancelEvent = cancelEvent) is None
+    finally:
+        ChessAI.shutdownProcessPool()
+
+#a side a queen down takes the draw by repetition, also when the root moves are searched by workers from a FEN
+def test_repetition_draw(monkeypatch):
+    monkeypatch.setattr(ChessAI, "DEPTH", 2)
+    gs = position("rnb1kbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+    for notation in ["g1f3", "g8f6", "f3g1", "f6g8", "g1f3", "g8f6", "f3g1"]:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getUCINotation() == notation))
+    move = ChessAI.findBestMove(gs, gs.getValidMoves())
+    assert move.getUCINotation() == "f6g8" and ChessAI.searchInfo['score'] == ChessAI.DRAW
+    try:
+        move = ChessAI.findBestMoveParallel(gs, gs.getValidMoves(), depth = 2, workers = 2)
+        assert move.getUCINotation() == "f6g8" and ChessAI.searchInfo['score'] == ChessAI.DRAW
+    finally:
+        ChessAI.shutdownProcessPool()
+
+#tuned weights reach the engine's piece-square scores only through applyTunedWeights, and only without mobility
+#unless the batch evaluator supplies it
+def test_apply_tuned_weights(tmp_path, monkeypatch):
+    ChessEval = pytest.importorskip("ChessEval")
+    path = str(tmp_path / "weights.npz")
+    evaluator = ChessEval.Evaluator()
+    evaluator.weights[8, 0] += 7 #white pawn on a7, middlegame
+    evaluator.save(path)
+    builtin = ChessEngine.MG_SQUARE_SCORES['wP'][8]
+    monkeypatch.setattr(ChessAI, "EVAL_WEIGHTS", path)
+    try:
+        assert not ChessAI.applyTunedWeights() #TUNED_WEIGHTS is off
+        monkeypatch.setattr(ChessAI, "TUNED_WEIGHTS", True)
+        with warnings.catch_warnings(record = True) as caught:
+            warnings.simplefilter("always")
+            assert not ChessAI.applyTunedWeights()
+        assert caught and ChessEngine.MG_SQUARE_SCORES['wP'][8] == builtin
+        monkeypatch.setattr(ChessAI, "BATCH_EVAL", True)
+        assert ChessAI.applyTunedWeights()
+        assert ChessEngine.MG_SQUARE_SCORES['wP'][8] == builtin + 7
+        assert not ChessAI.applyTunedWeights()
+    finally:
+        monkeypatch.setattr(ChessAI, "TUNED_WEIGHTS", False)
+        ChessAI.applyTunedWeights()
+    assert ChessEngine.MG_SQUARE_SCORES['wP'][8] == builtin
@@ -0,0 +1,39 @@
+import ChessEngine, ChessBook
+
+#reference keys from the Polyglot specification, for the moves played from the start position
+REFERENCE_KEYS = [
+    ([], 0x463B96181691FC9C),
+    (["e2e4"], 0x823C9B50FD114196),
+    (["e2e4", "d7d5"], 0x0756B94461C50FB0),
+    (["e2e4", "d7d5", "e4e5"], 0x662FAFB965DB29D4),
+    (["e2e4", "d7d5", "e4e5", "f7f5"], 0x22A48B5A8E47FF78),
+    (["e2e4", "d7d5", "e4e5", "f7f5", "e1e2"], 0x652A607CA3F242C1),
+    (["e2e4", "d7d5", "e4e5", "f7f5", "e1e2", "e8f7"], 0x00FDD303C946BDD9),
+    (["a2a4", "b7b5", "h2h4", "b5b4", "c2c4"], 0x3C8123EA7B067637),
+    (["a2a4", "b7b5", "h2h4", "b5b4", "c2c4", "b4c3", "a1a3"], 0x5C3F9B829B279560),
+]
+
+def test_polyglot_reference_keys():
+    for moves, key in REFERENCE_KEYS:
+        gs = ChessEngine.GameState()
+        for notation in moves:
+            gs.makeMove(next(move for move in gs.getValidMoves() if move.getUCINotation() == notation))
+        assert ChessBook.polyglotKey(gs) == key, " ".join(moves)
+
+#weights are scaled down to fit the entry, but a move that scored keeps a nonzero weight and a lost one stays at zero
+def test_build_book_weights(tmp_path, monkeypatch):
+    monkeypatch.setattr(ChessBook, "MAX_WEIGHT", 2)
+    pgnPath = tmp_path / "games.pgn"
+    games = [("e4", "1-0")] * 3 + [("d4", "1/2-1/2"), ("c4", "0-1")]
+    pgnPath.write_text("\n".join('[Result "%s"]\n\n1. %s %s\n' % (result, san, result) for san, result in games))
+    bookPath = str(tmp_path / "book.bin")
+    assert ChessBook.buildBook(str(pgnPath), bookPath) == (5, 3)
+    gs = ChessEngine.GameState()
+    moves = {ChessBook.encodeMove(move): move.getUCINotation() for move in gs.getValidMoves()}
+    book = ChessBook.OpeningBook(bookPath)
+    try:
+        weights = {moves[move]: weight for move, weight in book.findEntries(ChessBook.polyglotKey(gs))}
+        assert weights == {"e2e4": 2, "d2d4": 1, "c2c4": 0}
+        assert book.getMove(gs, gs.getValidMoves()).getUCINotation() in ("e2e4", "d2d4")
+    finally:
+        book.close()
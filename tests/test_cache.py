@@ -0,0 +1,47 @@
+import ChessEngine, ChessAI, ChessCache
+
+#keys above 2**63 survive the signed column, and a shallower result never replaces a deeper one
+def test_store_probe(tmp_path):
+    cache = ChessCache.AnalysisCache(str(tmp_path / "analysis.db"))
+    key = (1 << 64) - 5
+    assert cache.probe(key) is None
+    cache.store(key, 6, 35, "e2e4", 50000, 1.5)
+    assert cache.probe(key) == (6, 35, "e2e4", 50000, 1.5)
+    cache.store(key, 4, -10, "d2d4", 900, 0.1)
+    assert cache.probe(key) == (6, 35, "e2e4", 50000, 1.5)
+    cache.store(key, 7, 20, "g1f3", 90000, 2.5)
+    assert cache.probe(key) == (7, 20, "g1f3", 90000, 2.5)
+    cache.close()
+
+#a probe hit is written as a use with the next store, and eviction keeps the recently used positions
+def test_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(ChessCache, "EVICT_EVERY", 1)
+    cache = ChessCache.AnalysisCache(str(tmp_path / "analysis.db"), maxEntries = 4)
+    for key in range(4):
+        cache.store(key, 1, 0, "e2e4", 10, 0.01)
+    usedBefore = cache.connection.execute("SELECT used FROM analysis WHERE key = 0").fetchone()[0]
+    assert cache.probe(0) is not None
+    assert cache.connection.execute("SELECT used FROM analysis WHERE key = 0").fetchone()[0] == usedBefore #not written yet
+    cache.store(4, 1, 0, "e2e4", 10, 0.01)
+    assert cache.touched == {}
+    assert len(cache) == 3 #evicted down to EVICT_TO of maxEntries
+    assert cache.probe(0) is not None and cache.probe(4) is not None
+    assert cache.probe(1) is None and cache.probe(2) is None
+    cache.close()
+
+#a position searched as deep before is answered from the cache without searching
+def test_cached_move(tmp_path, monkeypatch):
+    monkeypatch.setattr(ChessAI, "USE_BOOK", False)
+    monkeypatch.setattr(ChessAI, "USE_ANALYSIS_CACHE", True)
+    monkeypatch.setattr(ChessAI, "ANALYSIS_CACHE_FILE", str(tmp_path / "analysis.db"))
+    monkeypatch.setattr(ChessAI, "DEPTH", 2)
+    gs = ChessEngine.GameState()
+    move = ChessAI.findBestMove(gs, gs.getValidMoves())
+    assert not ChessAI.searchInfo.get("cached")
+    assert ChessAI.findBestMove(gs, gs.getValidMoves()) == move
+    assert ChessAI.searchInfo.get("cached") and ChessAI.nodes == 0
+    monkeypatch.setattr(ChessAI, "DEPTH", 3) #deeper than stored, searched again
+    ChessAI.findBestMove(gs, gs.getValidMoves())
+    assert not ChessAI.searchInfo.get("cached")
+    ChessAI.analysisCache.close()
+    ChessAI.analysisCache = None
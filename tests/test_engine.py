@@ -0,0 +1,134 @@
+import random
+import ChessEngine
+
+#the start position and kiwipete, which has every kind of castling, en passant and promotion within a few moves
+FENS = [ChessEngine.START_FEN, "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"]
+
+def snapshot(gs):
+    return ([row[:] for row in gs.board], dict(gs.bitboards), dict(gs.occupancy), gs.zobristKey, gs.castlingRights,
+            gs.enPassantPossible, gs.halfmoveClock, gs.whiteMove, gs.wK_Location, gs.bK_Location, gs.mgScore, gs.egScore, gs.phase)
+
+def findMove(gs, notation):
+    return next(move for move in gs.getValidMoves() if move.getUCINotation() == notation)
+
+#every move of random games is made and undone before it is played: the position must come back exactly,
+#and the incrementally kept key, bitboards and scores must match the board
+def test_make_undo_round_trip():
+    rng = random.Random(7)
+    for fen in FENS:
+        for game in range(30):
+            gs = ChessEngine.GameState()
+            gs.loadFEN(fen)
+            for ply in range(60):
+                moves = gs.getValidMoves()
+                if not moves:
+                    break
+                before = snapshot(gs)
+                for move in moves:
+                    gs.makeMove(move)
+                    assert gs.zobristKey == gs.computeZobristKey(), move.getUCINotation()
+                    gs.undoMove()
+                    assert snapshot(gs) == before, move.getUCINotation()
+                gs.makeMove(moves[rng.randrange(len(moves))])
+                kept = (dict(gs.bitboards), gs.mgScore, gs.egScore, gs.phase)
+                gs.loadBitboards()
+                assert (gs.bitboards, gs.mgScore, gs.egScore, gs.phase) == kept
+
+#undoing the reply to a double pawn push brings back the en passant square
+def test_undo_restores_en_passant():
+    gs = ChessEngine.GameState()
+    for notation in ["e2e4", "a7a6", "e4e5", "d7d5"]:
+        gs.makeMove(findMove(gs, notation))
+    assert gs.enPassantPossible == (2, 3)
+    gs.makeMove(findMove(gs, "e5d6")) #en passant
+    gs.undoMove()
+    gs.makeMove(findMove(gs, "a2a3"))
+    gs.undoMove()
+    assert gs.enPassantPossible == (2, 3)
+    assert any(move.isEnpassantMove for move in gs.getValidMoves())
+
+#the key depends on the position only, not on the order of the moves that reached it
+def test_zobrist_transpositions():
+    first = ChessEngine.GameState()
+    for notation in ["g1f3", "g8f6", "b1c3", "b8c6"]:
+        first.makeMove(findMove(first, notation))
+    second = ChessEngine.GameState()
+    for notation in ["b1c3", "b8c6", "g1f3", "g8f6"]:
+        second.makeMove(findMove(second, notation))
+    assert first.zobristKey == second.zobristKey
+    third = ChessEngine.GameState()
+    for notation in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+        third.makeMove(findMove(third, notation))
+    assert third.zobristKey == ChessEngine.GameState().zobristKey
+    withSquare = ChessEngine.GameState()
+    withSquare.makeMove(findMove(withSquare, "e2e4"))
+    key = withSquare.zobristKey
+    withSquare.enPassantPossible = ()
+    assert withSquare.computeZobristKey() != key #the en passant file is part of the key
+
+#a king or rook move, or a capture on a rook's square, clears only the rights that piece had
+def test_castling_mask():
+    gs = ChessEngine.GameState()
+    gs.loadFEN("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    assert gs.castlingRights == ChessEngine.ALL_CASTLING
+    gs.makeMove(findMove(gs, "h1h8")) #takes the black kingside rook with the white one
+    assert gs.castlingRights == ChessEngine.WHITE_QUEENSIDE | ChessEngine.BLACK_QUEENSIDE
+    gs.makeMove(findMove(gs, "e8d7"))
+    assert gs.castlingRights == ChessEngine.WHITE_QUEENSIDE
+    gs.makeMove(findMove(gs, "e1c1")) #castles long
+    assert gs.castlingRights == 0
+    assert gs.board[7][3] == "wR" and gs.board[7][0] == "--"
+    gs.undoMove()
+    assert gs.castlingRights == ChessEngine.WHITE_QUEENSIDE and gs.board[7][0] == "wR"
+    gs.undoMove()
+    gs.undoMove()
+    assert gs.castlingRights == ChessEngine.ALL_CASTLING and gs.board[0][7] == "bR"
+
+#each move pushes the rights, en passant square, key and halfmove clock it replaced, and undoMove pops them
+def test_undo_stack():
+    gs = ChessEngine.GameState()
+    states = []
+    for notation in ["g1f3", "e7e5", "f3e5", "d7d5"]:
+        states.append((gs.castlingRights, gs.enPassantPossible, gs.zobristKey, gs.halfmoveClock))
+        gs.makeMove(findMove(gs, notation))
+    assert gs.stateLog == states
+    assert gs.halfmoveClock == 0 and gs.enPassantPossible == (2, 3)
+    while gs.moveLog:
+        gs.undoMove()
+        assert (gs.castlingRights, gs.enPassantPossible, gs.zobristKey, gs.halfmoveClock) == states.pop()
+    assert gs.stateLog == []
+
+#the third occurrence of a position is a draw, the second is not
+def test_threefold_repetition():
+    gs = ChessEngine.GameState()
+    for notation in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+        gs.makeMove(findMove(gs, notation))
+    assert gs.repetitionCount() == 1 and gs.getDrawReason() is None
+    assert gs.isRepetition(4) and not gs.isRepetition(0)
+    for notation in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+        gs.makeMove(findMove(gs, notation))
+    assert gs.repetitionCount() == 2 and gs.getDrawReason() == "threefold repetition"
+    assert gs.isRepetition(0)
+
+#a hundred plies without a capture or pawn move draw the game, a pawn move starts the count again
+def test_fifty_move_rule():
+    gs = ChessEngine.GameState()
+    gs.loadFEN("4k3/4p3/8/8/8/8/R7/4K3 w - - 99 80")
+    gs.makeMove(findMove(gs, "a2a3"))
+    assert gs.halfmoveClock == 100 and gs.getDrawReason() == "fifty-move rule"
+    gs.undoMove()
+    assert gs.halfmoveClock == 99 and gs.getDrawReason() is None
+    gs.makeMove(findMove(gs, "a2a3"))
+    gs.makeMove(findMove(gs, "e7e6"))
+    assert gs.halfmoveClock == 0
+
+def test_insufficient_material():
+    drawn = ["8/8/4k3/8/8/8/8/4K3 w - - 0 1", "8/8/4k3/8/8/2B5/8/4K3 w - - 0 1", "8/8/4k3/8/8/2n5/8/4K3 w - - 0 1",
+             "8/8/4k3/8/3b4/2B5/8/4K3 w - - 0 1"] #bishops on one square color
+    playable = ["8/8/4k3/8/8/2NN4/8/4K3 w - - 0 1", "8/8/4k3/8/2b5/2B5/8/4K3 w - - 0 1", "8/8/4k3/8/8/2Bn4/8/4K3 w - - 0 1",
+                "8/8/4k3/8/8/8/4P3/4K3 w - - 0 1"]
+    for fen in drawn + playable:
+        gs = ChessEngine.GameState()
+        gs.loadFEN(fen)
+        assert gs.isInsufficientMaterial() == (fen in drawn), fen
+        assert (gs.getDrawReason() == "insufficient material") == (fen in drawn), fen
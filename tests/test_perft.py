@@ -0,0 +1,18 @@
+import pytest
+import ChessEngine, ChessPerft
+
+#the published results of every suite position at the depths that count a few thousand nodes at most
+SHALLOW = [(name, fen, depth, nodes) for name, fen, results in ChessPerft.PERFT_SUITE
+           for depth, nodes in results.items() if nodes <= 10000]
+
+@pytest.mark.parametrize("name, fen, depth, nodes", SHALLOW, ids = [entry[0] + " " + str(entry[2]) for entry in SHALLOW])
+def test_perft(name, fen, depth, nodes):
+    gs = ChessPerft.loadPosition(fen)
+    assert ChessPerft.perft(gs, depth) == nodes
+
+#divide splits the same count by root move and leaves the position as it was
+def test_divide():
+    gs = ChessPerft.loadPosition(ChessEngine.START_FEN)
+    counts = ChessPerft.divide(gs, 2)
+    assert len(counts) == 20 and set(counts.values()) == {20}
+    assert gs.zobristKey == ChessEngine.GameState().zobristKey
@@ -0,0 +1,35 @@
+import pytest
+import ChessEngine, ChessTablebase
+
+def probe(tablebases, fen):
+    gs = ChessEngine.GameState()
+    gs.loadFEN(fen)
+    return ChessTablebase.decodeValue(tablebases.probe(gs))
+
+#rotated, mirrored and color-swapped copies of a position share its result
+def test_kqk_symmetry(tmp_path):
+    tablebases = ChessTablebase.Tablebases(str(tmp_path))
+    tablebases.generate("KQvK", log = lambda line: None)
+    values = tablebases.getTable("KQvK")
+    assert max(value for value in values if value < ChessTablebase.LOSS) == 19 #mate in 10 at most
+    assert len(values) == 2 * 10 * 64 ** 2
+    for fen in ["k7/Q7/1K6/8/8/8/8/8 b - - 0 1", "7k/7Q/6K1/8/8/8/8/8 b - - 0 1", "8/8/8/8/8/1K6/Q7/k7 b - - 0 1",
+                "8/8/8/8/8/6K1/7Q/7k b - - 0 1", "1Q5k/8/7K/8/8/8/8/8 b - - 0 1", "K7/q7/1k6/8/8/8/8/8 w - - 0 1"]:
+        assert probe(tablebases, fen) == ("loss", 0) #mated
+    assert probe(tablebases, "k7/8/1K6/8/8/8/8/6Q1 w - - 0 1") == probe(tablebases, "6q1/8/8/8/8/1k6/8/K7 b - - 0 1") == ("win", 1)
+    tablebases.close()
+
+def test_en_passant_signatures_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ChessTablebase.Tablebases(str(tmp_path)).generate("KPvKP")
+
+#the longest KQvKR win is a mate in 35, and a rook attacking the unprotected queen wins for whoever moves first
+@pytest.mark.slow
+def test_kqkr(tmp_path):
+    tablebases = ChessTablebase.Tablebases(str(tmp_path))
+    tablebases.generate("KQvKR", log = lambda line: None)
+    values = tablebases.getTable("KQvKR")
+    assert max(value for value in values if value < ChessTablebase.LOSS) == 69
+    assert probe(tablebases, "7Q/8/8/1K6/8/8/3k4/7r w - - 0 1")[0] == "win"
+    assert probe(tablebases, "7Q/8/8/1K6/8/8/3k4/7r b - - 0 1")[0] == "win"
+    tablebases.close()
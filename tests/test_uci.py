@@ -0,0 +1,49 @@
+import io
+import ChessEngine, ChessAI, ChessUCI
+
+def engine():
+    out = io.StringIO()
+    return ChessUCI.UCIEngine(out), out
+
+#startpos and fen positions with the moves played after them, an illegal move stops the list
+def test_position():
+    uci, out = engine()
+    uci.handle("position startpos moves e2e4 e7e5 g1f3")
+    assert uci.gs.getFEN() == "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"
+    uci.handle("position fen 4k3/8/8/8/8/8/4P3/4K3 w - - 0 1 moves e2e4 e8d7")
+    assert uci.gs.getFEN() == "8/3k4/8/8/4P3/8/8/4K3 w - - 1 2"
+    uci.handle("position startpos moves e2e4 e2e4")
+    assert "info string illegal move e2e4" in out.getvalue()
+    assert len(uci.gs.moveLog) == 1
+
+#movetime is used as given, a clock is shared over the moves to go plus most of the increment
+def test_search_time():
+    assert abs(ChessUCI.searchTime(True, {"movetime": 1000}) - (1 - ChessUCI.MOVE_OVERHEAD)) < 1e-9
+    assert abs(ChessUCI.searchTime(False, {"wtime": 1000, "btime": 60000, "binc": 1000, "movestogo": 20}) - (3 + 0.75)) < 1e-9
+    assert ChessUCI.searchTime(True, {"depth": 3}) is None
+
+#go depth answers with info lines and a legal bestmove once the search thread ends
+def test_go_depth(monkeypatch):
+    monkeypatch.setattr(ChessAI, "USE_BOOK", False)
+    uci, out = engine()
+    uci.handle("position startpos moves e2e4")
+    uci.handle("go depth 2")
+    uci.searchThread.join()
+    lines = out.getvalue().splitlines()
+    assert lines[-2].startswith("info depth 2 score cp ")
+    assert lines[-1].split()[1] in [move.getUCINotation() for move in uci.gs.getValidMoves()]
+
+#mates are reported in moves from the distance the score holds, other scores in centipawns
+def test_score_text():
+    assert ChessUCI.scoreText(ChessAI.CHECKMATE - 3) == "mate 2"
+    assert ChessUCI.scoreText(-(ChessAI.CHECKMATE - 2)) == "mate -1"
+    assert ChessUCI.scoreText(35) == "cp 35"
+
+#options are matched by name without case, unknown ones are reported
+def test_setoption(monkeypatch):
+    monkeypatch.setattr(ChessAI, "THREADS", ChessAI.THREADS)
+    uci, out = engine()
+    uci.handle("setoption name Threads value 3")
+    assert ChessAI.THREADS == 3
+    uci.handle("setoption name Missing Option value 1")
+    assert "info string unknown option Missing Option" in out.getvalue()